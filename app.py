@@ -1,21 +1,212 @@
 from fastapi import FastAPI, Response, Request
 from twilio.twiml.voice_response import VoiceResponse, Gather
 from twilio.rest import Client
-from openai import OpenAI
-import os, time, requests, re
+from twilio.http.http_client import TwilioHttpClient
+from twilio.base.exceptions import TwilioRestException
+from openai import AsyncOpenAI
+from contextlib import asynccontextmanager, contextmanager
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
+import os, time, re, asyncio, json, random, secrets, sqlite3, threading, contextvars, httpx, requests, urllib3
 from urllib.parse import quote_plus
-
-app = FastAPI()
+from xml.sax.saxutils import escape as xml_escape
 
 # === API keys / config ===
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 GOOGLE_API_KEY = os.environ.get("google_maps_key") or os.environ.get("GOOGLE_MAPS_KEY")
+GOOGLE_MAPS_BASE_URL = os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com").rstrip("/")
 
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_FROM_NUMBER = os.getenv("TWILIO_FROM_NUMBER")  # SMS-capable Twilio number (+1XXXXXXXXXX)
 
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if (TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN) else None
+# Per-upstream timeouts (seconds). Twilio gives up on a webhook after ~15s,
+# so every outbound call has to finish well inside that.
+GOOGLE_TIMEOUT = float(os.getenv("GOOGLE_TIMEOUT", "4"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "8"))
+TWILIO_TIMEOUT = float(os.getenv("TWILIO_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+TWILIO_MAX_WORKERS = int(os.getenv("TWILIO_MAX_WORKERS", "32"))
+
+# OPENAI_BASE_URL is honoured by the SDK itself
+client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), timeout=OPENAI_TIMEOUT, max_retries=1)
+twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, http_client=TwilioHttpClient(timeout=TWILIO_TIMEOUT)) if (TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN) else None
+# The Twilio SDK is sync-only, so sends run on their own pool instead of the
+# small default executor (which a burst of SMS would otherwise saturate)
+twilio_executor = ThreadPoolExecutor(max_workers=TWILIO_MAX_WORKERS, thread_name_prefix="twilio")
+
+# === Shared async HTTP client ===
+# One pooled keep-alive client for every Google call, so a slow upstream
+# only ties up its own request instead of the whole event loop.
+http_client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(GOOGLE_TIMEOUT, connect=2.0),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS // 5 or 1,
+                keepalive_expiry=30,
+            ),
+        )
+    return http_client
+
+@asynccontextmanager
+async def lifespan(app):
+    get_http_client()
+    sweeper = asyncio.create_task(sessions.sweep_forever(SESSION_SWEEP_INTERVAL))
+    warmup = asyncio.create_task(warm_geo_cache()) if GOOGLE_API_KEY else None
+    sms_queue.start()
+    yield
+    sweeper.cancel()
+    if warmup:
+        warmup.cancel()
+    await sms_queue.stop()
+    if http_client is not None:
+        await http_client.aclose()
+    await client.close()
+    twilio_executor.shutdown(wait=False)
+    sessions.close()
+    geocode_cache.close()
+    directions_cache.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# === Metrics / tracing ===
+# Twilio abandons a webhook after ~15s; turns slower than this get logged
+SLOW_TURN_MS = float(os.getenv("SLOW_TURN_MS", "5000"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15)
+
+def label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+def format_labels(names, values, extra=None):
+    pairs = [f'{name}="{label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append('%s="%s"' % extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    """Prometheus histogram with one series per combination of label values."""
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series = {}   # label values -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value, *labelvalues):
+        series = self.series.get(labelvalues)
+        if series is None:
+            series = self.series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for values, (counts, total) in sorted(self.series.items()):
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                running += count
+                yield f"{self.name}_bucket{format_labels(self.labelnames, values, ('le', bound))} {running}"
+            yield f"{self.name}_sum{format_labels(self.labelnames, values)} {total:.6f}"
+            yield f"{self.name}_count{format_labels(self.labelnames, values)} {running}"
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for values, total in sorted(self.values.items()):
+            yield f"{self.name}{format_labels(self.labelnames, values)} {total}"
+
+turn_latency = Histogram("cpr_turn_duration_seconds", "Webhook handling time per turn.", ("route", "intent"))
+stage_latency = Histogram(
+    "cpr_stage_duration_seconds",
+    "Time spent in each stage of a turn; upstream stages are named after the call they make.",
+    ("stage",)
+)
+upstream_errors = Counter("cpr_upstream_errors_total", "Upstream calls that raised or returned an HTTP error.", ("stage",))
+slow_turns = Counter("cpr_slow_turns_total", "Turns slower than SLOW_TURN_MS.", ("route", "intent"))
+
+class LatencySamples:
+    def __init__(self, histogram, maxlen=1000):
+        self.histogram = histogram
+        self.samples = deque(maxlen=maxlen)
+        self.count = 0
+
+    def record(self, ms):
+        self.samples.append(ms)
+        self.count += 1
+        self.histogram.observe(ms / 1000)
+
+    def snapshot(self):
+        ordered = sorted(self.samples)
+        pick = lambda pct: round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))], 1) if ordered else 0.0
+        return {"count": self.count, "p50_ms": pick(0.5), "p95_ms": pick(0.95), "max_ms": pick(1.0)}
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+class TurnTrace:
+    __slots__ = ("route", "call_sid", "intent", "started", "spans", "open")
+
+    def __init__(self, route):
+        self.route = route
+        self.call_sid = None
+        self.intent = ""
+        self.started = time.perf_counter()
+        self.spans = []   # (stage, ms)
+        self.open = True
+
+    def finish(self):
+        self.open = False
+        seconds = time.perf_counter() - self.started
+        turn_latency.observe(seconds, self.route, self.intent)
+        if seconds * 1000 >= SLOW_TURN_MS:
+            slow_turns.inc(self.route, self.intent)
+            print(json.dumps({
+                "event": "slow_turn", "route": self.route, "call_sid": self.call_sid, "intent": self.intent,
+                "total_ms": round(seconds * 1000, 1), "spans": [{"stage": s, "ms": ms} for s, ms in self.spans],
+            }))
+
+@contextmanager
+def turn_trace(route):
+    trace = TurnTrace(route)
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+        trace.finish()
+
+@contextmanager
+def span(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        upstream_errors.inc(stage)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        stage_latency.observe(seconds, stage)
+        trace = current_trace.get()
+        # Background tasks inherit the turn's context; don't add to a finished turn
+        if trace is not None and trace.open:
+            trace.spans.append((stage, round(seconds * 1000, 1)))
 
 # === Store details ===
 STORE_INFO = {
@@ -27,13 +218,227 @@ STORE_INFO = {
 }
 
 # === Per-call session data ===
-call_activity = {}     # last interaction timestamp
-call_mode = {}         # "normal", "awaiting_origin", "offer_sms"
-call_memory = {}       # short-term conversation memory
-caller_numbers = {}    # call_sid -> '+1XXXXXXXXXX'
-pending_maps = {}      # call_sid -> {'link': str}
-
 MAX_MEMORY = 5
+SESSION_MAX_CALLS = int(os.getenv("SESSION_MAX_CALLS", "5000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "900"))        # seconds without a turn
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+# Several uvicorn workers (WEB_CONCURRENCY) only see each other's calls
+# through the SQLite backend, so default to it whenever there is more than one.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND") or ("sqlite" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+# SQLite calls run on their own threads so a worker waiting on another
+# worker's write lock never stalls the event loop; the busy timeout stays
+# well under Twilio's webhook deadline.
+SESSION_DB_THREADS = int(os.getenv("SESSION_DB_THREADS", "4"))
+SESSION_DB_BUSY_TIMEOUT = float(os.getenv("SESSION_DB_BUSY_TIMEOUT", "1"))
+
+class CallSession:
+    __slots__ = (
+        "call_sid", "last_activity", "mode", "memory", "caller_number", "pending_map", "pending_question",
+        "pending_turn", "pending_spoken",
+    )
+
+    def __init__(self, call_sid, last_activity=0.0, mode="normal", memory=None, caller_number=None, pending_map=None,
+                 pending_question=None, pending_turn=None, pending_spoken=""):
+        self.call_sid = call_sid
+        self.last_activity = last_activity   # last interaction timestamp
+        self.mode = mode                     # "normal", "awaiting_origin", "offer_sms", "ended"
+        self.memory = memory if memory is not None else []   # short-term conversation memory
+        self.caller_number = caller_number   # '+1XXXXXXXXXX'
+        self.pending_map = pending_map       # {'link': str}
+        self.pending_question = pending_question   # question whose LLM answer is still being collected
+        self.pending_turn = pending_turn           # id of that answer; result redirects carry it
+        self.pending_spoken = pending_spoken       # part of that answer the caller has already heard
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+class SessionBackend(ABC):
+    """Where CallSession records live. Every backend evicts least-recently-used
+    calls beyond its capacity; expire() drops calls idle since before cutoff.
+
+    Backends whose calls can block set blocking; SessionStore then runs them
+    off the event loop.
+    """
+
+    blocking = False
+
+    @abstractmethod
+    def get(self, call_sid): ...
+
+    @abstractmethod
+    def put(self, session): ...
+
+    @abstractmethod
+    def delete(self, call_sid): ...
+
+    @abstractmethod
+    def expire(self, cutoff): ...
+
+    @abstractmethod
+    def count_since(self, cutoff): ...
+
+    @abstractmethod
+    def __len__(self): ...
+
+class MemorySessionBackend(SessionBackend):
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.sessions = OrderedDict()
+
+    def get(self, call_sid):
+        return self.sessions.get(call_sid)
+
+    def put(self, session):
+        self.sessions[session.call_sid] = session
+        self.sessions.move_to_end(session.call_sid)
+        while len(self.sessions) > self.capacity:
+            self.sessions.popitem(last=False)
+
+    def delete(self, call_sid):
+        self.sessions.pop(call_sid, None)
+
+    def expire(self, cutoff):
+        # Oldest first, so stop at the first call that is still active
+        expired = 0
+        while self.sessions:
+            call_sid, session = next(iter(self.sessions.items()))
+            if session.last_activity >= cutoff:
+                break
+            del self.sessions[call_sid]
+            expired += 1
+        return expired
+
+    def count_since(self, cutoff):
+        # Newest first, so stop at the first call that has gone quiet
+        active = 0
+        for session in reversed(self.sessions.values()):
+            if session.last_activity < cutoff:
+                break
+            active += 1
+        return active
+
+    def __len__(self):
+        return len(self.sessions)
+
+class SQLiteSessionBackend(SessionBackend):
+    """Shared across uvicorn workers on the same host via one WAL-mode file.
+    Each thread gets its own connection."""
+
+    EVICT_EVERY = 64   # puts between capacity checks
+    blocking = True
+
+    def __init__(self, path, capacity, busy_timeout=SESSION_DB_BUSY_TIMEOUT):
+        self.path = path
+        self.capacity = capacity
+        self.busy_timeout = busy_timeout
+        self.puts = 0
+        self.local = threading.local()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS call_sessions ("
+            "call_sid TEXT PRIMARY KEY, last_activity REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS call_sessions_activity ON call_sessions (last_activity)")
+
+    @property
+    def db(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = self.local.db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def get(self, call_sid):
+        row = self.db.execute("SELECT data FROM call_sessions WHERE call_sid = ?", (call_sid,)).fetchone()
+        return CallSession.from_dict(json.loads(row[0])) if row else None
+
+    def put(self, session):
+        self.db.execute(
+            "INSERT OR REPLACE INTO call_sessions (call_sid, last_activity, data) VALUES (?, ?, ?)",
+            (session.call_sid, session.last_activity, json.dumps(session.to_dict()))
+        )
+        self.puts += 1
+        if self.puts % self.EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        self.db.execute(
+            "DELETE FROM call_sessions WHERE call_sid IN ("
+            "SELECT call_sid FROM call_sessions ORDER BY last_activity DESC LIMIT -1 OFFSET ?)",
+            (self.capacity,)
+        )
+
+    def delete(self, call_sid):
+        self.db.execute("DELETE FROM call_sessions WHERE call_sid = ?", (call_sid,))
+
+    def expire(self, cutoff):
+        self.evict()
+        return self.db.execute("DELETE FROM call_sessions WHERE last_activity < ?", (cutoff,)).rowcount
+
+    def count_since(self, cutoff):
+        return self.db.execute("SELECT COUNT(*) FROM call_sessions WHERE last_activity >= ?", (cutoff,)).fetchone()[0]
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM call_sessions").fetchone()[0]
+
+class SessionStore:
+    def __init__(self, backend, idle_ttl):
+        self.backend = backend
+        self.idle_ttl = idle_ttl
+        self.executor = ThreadPoolExecutor(max_workers=SESSION_DB_THREADS, thread_name_prefix="sessions") if backend.blocking else None
+
+    async def run(self, fn, *args):
+        if self.executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def load(self, call_sid):
+        return await self.run(self.backend.get, call_sid) or CallSession(call_sid)
+
+    async def save(self, session):
+        # A lock that outlasts the busy timeout loses this turn's state, not the reply
+        try:
+            if session.mode == "ended":
+                await self.run(self.backend.delete, session.call_sid)
+            else:
+                await self.run(self.backend.put, session)
+        except sqlite3.Error as e:
+            print(f"[ERROR] Saving session {session.call_sid} failed: {e}")
+
+    async def expire_idle(self, now=None):
+        return await self.run(self.backend.expire, (now or time.time()) - self.idle_ttl)
+
+    async def counts(self, active_since):
+        """(calls active since active_since, all stored calls)"""
+        return await self.run(lambda: (self.backend.count_since(active_since), len(self.backend)))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    async def sweep_forever(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                expired = await self.expire_idle()
+                if expired:
+                    print(f"[INFO] Expired {expired} idle call sessions")
+            except Exception as e:
+                print(f"[ERROR] Session sweep failed: {e}")
+
+def build_session_backend(kind=SESSION_BACKEND):
+    if kind == "sqlite":
+        return SQLiteSessionBackend(SESSION_DB_PATH, SESSION_MAX_CALLS)
+    if kind == "memory":
+        return MemorySessionBackend(SESSION_MAX_CALLS)
+    raise ValueError(f"Unknown SESSION_BACKEND: {kind!r}")
+
+sessions = SessionStore(build_session_backend(), SESSION_IDLE_TTL)
 
 # === Voice helper (slow speech) ===
 def slow_say(self, text, **kwargs):
@@ -47,42 +452,370 @@ VoiceResponse._original_say = VoiceResponse.say
 VoiceResponse.say = slow_say
 
 # === Memory helper ===
-def remember(call_sid, role, content):
-    if call_sid not in call_memory:
-        call_memory[call_sid] = []
-    call_memory[call_sid].append({"role": role, "content": content})
-    call_memory[call_sid] = call_memory[call_sid][-MAX_MEMORY:]
+def remember(session, role, content):
+    session.memory.append({"role": role, "content": content})
+    session.memory = session.memory[-MAX_MEMORY:]
+
+# === Caching ===
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "cache.db")
+GEO_CACHE_SIZE = int(os.getenv("GEO_CACHE_SIZE", "2048"))
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(30 * 86400)))   # Google allows 30 days for lat/lng
+DIRECTIONS_CACHE_TTL = float(os.getenv("DIRECTIONS_CACHE_TTL", "86400"))
+# The disk tier is one file shared by every worker; it is only touched from these threads
+CACHE_DB_THREADS = int(os.getenv("CACHE_DB_THREADS", "2"))
+CACHE_DB_BUSY_TIMEOUT = float(os.getenv("CACHE_DB_BUSY_TIMEOUT", "1"))
+# Common origins to pre-route at startup; empty disables the warm-up
+WARMUP_LANDMARKS = [x.strip() for x in os.getenv(
+    "WARMUP_LANDMARKS",
+    "Myrtle Beach International Airport,Broadway at the Beach,Coastal Grand Mall,"
+    "SkyWheel Myrtle Beach,The Market Common,Tanger Outlets Myrtle Beach"
+).split(",") if x.strip()]
+
+class TTLCache:
+    """In-memory LRU with a per-entry expiry."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()   # key -> (expires_at, value)
+
+    def get(self, key, default=None):
+        value = self.peek(key, default)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        return value
+
+    def peek(self, key, default=None):
+        """get() without marking the entry as recently used."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] < time.time():
+            del self.entries[key]
+            return default
+        return entry[1]
+
+    def set(self, key, value, ttl=None):
+        self.entries[key] = (time.time() + (ttl or self.ttl), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+class SQLiteCache:
+    """On-disk key/value tier that survives restarts; values are JSON.
+    Each thread gets its own connection."""
+
+    def __init__(self, path, table, ttl, busy_timeout=CACHE_DB_BUSY_TIMEOUT):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.busy_timeout = busy_timeout
+        self.local = threading.local()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)")
+        self.db.execute(f"DELETE FROM {table} WHERE expires_at < ?", (time.time(),))
+
+    @property
+    def db(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = self.local.db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def get(self, key):
+        row = self.db.execute(f"SELECT expires_at, value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, key, value):
+        self.db.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, expires_at, value) VALUES (?, ?, ?)",
+            (key, time.time() + self.ttl, json.dumps(value))
+        )
+
+class TieredCache:
+    """Memory tier in front of a disk tier, counting what each hit saved.
+
+    Every entry remembers how many upstream requests produced it and how long
+    they took, so a hit can credit both to saved_calls and saved_ms. The disk
+    tier runs on its own threads: reads are awaited, writes are not, and a
+    disk error only ever costs a miss.
+    """
+
+    def __init__(self, name, maxsize, ttl, path=CACHE_DB_PATH):
+        self.name = name
+        self.memory = TTLCache(maxsize, ttl)
+        try:
+            self.disk = SQLiteCache(path, f"{name}_cache", ttl) if path else None
+        except sqlite3.Error as e:
+            print(f"[ERROR] {name} disk cache unavailable: {e}")
+            self.disk = None
+        self.executor = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "saved_calls": 0, "saved_ms": 0.0}
+
+    def pool(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=CACHE_DB_THREADS, thread_name_prefix=f"{self.name}-cache")
+        return self.executor
+
+    async def get(self, key):
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.stats["memory_hits"] += 1
+        elif (row := await self.disk_get(key)) is not None:
+            expires_at, entry = row
+            self.memory.set(key, entry, ttl=expires_at - time.time())
+            self.stats["disk_hits"] += 1
+        else:
+            self.stats["misses"] += 1
+            return None
+        self.stats["saved_calls"] += entry["calls"]
+        self.stats["saved_ms"] += entry["ms"]
+        return entry["value"]
+
+    async def disk_get(self, key):
+        if self.disk is None:
+            return None
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool(), self.disk.get, key)
+        except sqlite3.Error as e:
+            print(f"[ERROR] {self.name} disk cache read failed: {e}")
+            return None
+
+    def set(self, key, value, cost_ms, calls=1):
+        entry = {"value": value, "ms": round(cost_ms, 1), "calls": calls}
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.pool().submit(self.disk_set, key, entry)
+
+    def disk_set(self, key, entry):
+        try:
+            self.disk.set(key, entry)
+        except sqlite3.Error as e:
+            print(f"[ERROR] {self.name} disk cache write failed: {e}")
+
+    def close(self):
+        # Queued writes still finish; nothing new is accepted until the next pool()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def snapshot(self):
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "saved_ms": round(self.stats["saved_ms"], 1),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "size": len(self.memory),
+        }
+
+geocode_cache = TieredCache("geocode", GEO_CACHE_SIZE, GEOCODE_CACHE_TTL)
+directions_cache = TieredCache("directions", GEO_CACHE_SIZE, DIRECTIONS_CACHE_TTL)
 
 # === Geo helpers ===
-def geocode_address(address):
-    print(f"[DEBUG] Geocoding request for: '{address}'")
-    geo_url = "https://maps.googleapis.com/maps/api/geocode/json"
+# A Google request still running after this percentile of recent latency
+# for its endpoint gets a duplicate; whichever answers first is used.
+GOOGLE_HEDGE_PERCENTILE = float(os.getenv("GOOGLE_HEDGE_PERCENTILE", "95"))   # 0 turns hedging off
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05   # seconds
+# Hedges and the resolver's early backup path (below) are extra requests;
+# they only start while less than this share of Google connection slots is in use.
+SPECULATIVE_MAX_LOAD = 0.5
+
+google_latency = {}   # stage -> recent request durations (seconds)
+hedged_requests = Counter(
+    "cpr_hedged_requests_total",
+    "Duplicate Google requests sent because the first was slow; won = the duplicate answered first.",
+    ("stage", "outcome")
+)
+
+class RequestSlots:
+    """Caps in-flight Google requests at the connection pool size.
+
+    Waiting here is safe to cancel, unlike waiting inside httpx's own pool:
+    a request that times out there can leave a connection stuck in it.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self, timeout):
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise httpx.PoolTimeout("every Google connection slot is busy")
+        self.in_flight += 1
+
+    def release(self, task=None):
+        self.in_flight -= 1
+        self.semaphore.release()
+        if task is not None and not task.cancelled():
+            task.exception()   # retrieved, so a dropped failure isn't logged as unhandled
+
+    def has_headroom(self):
+        return self.in_flight < self.limit * SPECULATIVE_MAX_LOAD
+
+google_slots = RequestSlots(HTTP_MAX_CONNECTIONS)
+
+def hedge_delay(stage):
+    samples = google_latency.get(stage)
+    if not GOOGLE_HEDGE_PERCENTILE or samples is None or len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return max(HEDGE_MIN_DELAY, ordered[min(len(ordered) - 1, int(len(ordered) * GOOGLE_HEDGE_PERCENTILE / 100))])
+
+async def google_request(path, params, stage):
+    started = time.perf_counter()
+    samples = google_latency.setdefault(stage, deque(maxlen=200))
+    request = None
+    try:
+        with span(stage):
+            await google_slots.acquire(GOOGLE_TIMEOUT)
+            # Cancelling an httpx request mid-flight can strand its pooled
+            # connection, so a cancelled caller only stops waiting; the
+            # exchange itself finishes in the background and frees its slot.
+            request = asyncio.ensure_future(
+                get_http_client().get(f"{GOOGLE_MAPS_BASE_URL}{path}", params=params, timeout=GOOGLE_TIMEOUT)
+            )
+            request.add_done_callback(google_slots.release)
+            r = await asyncio.shield(request)
+            if r.status_code >= 400:
+                upstream_errors.inc(stage)
+            samples.append(time.perf_counter() - started)
+            return r.json()
+    except asyncio.CancelledError:
+        # Hedge losers are the slow tail; keep them in the samples as a lower bound
+        if request is not None:
+            samples.append(time.perf_counter() - started)
+        raise
+
+async def google_get(path, params, stage):
+    delay = hedge_delay(stage)
+    if delay is None or not google_slots.has_headroom():
+        return await google_request(path, params, stage)
+
+    first = asyncio.create_task(google_request(path, params, stage))
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done or not google_slots.has_headroom():
+            return await first
+        hedged_requests.inc(stage, "fired")
+        hedge = asyncio.create_task(google_request(path, params, stage))
+        pending.add(hedge)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            answered = [task for task in done if not task.exception()]
+            if answered:
+                if answered[0] is hedge:
+                    hedged_requests.inc(stage, "won")
+                return answered[0].result()
+            if not pending:
+                return done.pop().result()   # both failed; raise
+    finally:
+        for task in pending:
+            task.cancel()
+
+# Spoken origins vary in filler and spelling more than in place; strip that
+# before using the text as a cache key.
+ORIGIN_FILLER = re.compile(
+    r"^(?:(?:um+|uh+|so|well|okay|ok|yeah)(?:\s+|$))*"
+    # Lead-ins must end at a word boundary: "Atwood" and "Fromm Road" are places
+    r"(?:(?:(?:i'?m|i\s+am|we'?re|we\s+are)\s+(?:at|near|by|coming\s+from|staying\s+at)|"
+    r"(?:i'?m|i\s+am|we'?re|we\s+are)\s+coming\s+from|"
+    r"(?:starting|leaving|coming)\s+from|(?:staying|located)\s+at|from|at|near)(?:\s+|$))?"
+    r"(?:the\s+)?"
+)
+ORIGIN_ABBREVIATIONS = {
+    "st": "street", "rd": "road", "ave": "avenue", "blvd": "boulevard", "hwy": "highway",
+    "dr": "drive", "ln": "lane", "pkwy": "parkway", "n": "north", "s": "south",
+    "e": "east", "w": "west", "mb": "myrtle beach", "intl": "international",
+}
+
+def normalize_origin(text):
+    text = re.sub(r"[^\w\s']", " ", text.lower())
+    text = ORIGIN_FILLER.sub("", re.sub(r"\s+", " ", text).strip())
+    text = " ".join(ORIGIN_ABBREVIATIONS.get(word, word) for word in text.split())
+    # "North Myrtle Beach" is a different city, so only plain "Myrtle Beach" is dropped
+    return re.sub(r"\s*(?<!north )\b(?:in\s+)?myrtle beach(?:\s+(?:sc|south carolina))?$", "", text).strip()
+
+def coords_key(origin):
+    # ~100m grid, so nearby origins share a cached route
+    try:
+        lat, lng = (float(x) for x in origin.split(","))
+    except ValueError:
+        return normalize_origin(origin)
+    return f"{lat:.3f},{lng:.3f}"
+
+def first_location(data):
+    if data.get("status") == "OK" and data.get("results"):
+        loc = data["results"][0]["geometry"]["location"]
+        return f"{loc['lat']},{loc['lng']}"
+    return None
+
+async def geocode_lookup(address):
+    geo_url = "/maps/api/geocode/json"
     geo_params = {
         "address": address,
         "components": "locality:Myrtle Beach|administrative_area:SC|country:US",
         "key": GOOGLE_API_KEY
     }
-    r = requests.get(geo_url, params=geo_params)
-    geo_data = r.json()
+    return first_location(await google_get(geo_url, geo_params, "geocode"))
 
-    if geo_data.get("status") == "OK" and geo_data.get("results"):
-        loc = geo_data["results"][0]["geometry"]["location"]
-        return f"{loc['lat']},{loc['lng']}"
-
-    places_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+async def places_lookup(address):
+    places_url = "/maps/api/place/textsearch/json"
     places_params = {
         "query": f"{address}, Myrtle Beach, SC",
         "key": GOOGLE_API_KEY
     }
-    r = requests.get(places_url, params=places_params)
-    places_data = r.json()
-    if places_data.get("status") == "OK" and places_data.get("results"):
-        loc = places_data["results"][0]["geometry"]["location"]
-        return f"{loc['lat']},{loc['lng']}"
-    return None
+    return first_location(await google_get(places_url, places_params, "places"))
+
+async def first_found(*coros):
+    """Runs lookups concurrently and returns the first non-empty result,
+    cancelling the rest. Raises only if every lookup raised."""
+    pending = {asyncio.create_task(coro) for coro in coros}
+    errors = []
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception():
+                    errors.append(task.exception())
+                elif task.result():
+                    return task.result()
+        if len(errors) == len(coros):
+            raise errors[0]
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def fetch_geocode(address):
+    """Geocoding handles street addresses and Places handles landmarks; asking
+    both at once saves the serial fallback round trip when Geocoding misses."""
+    return await first_found(geocode_lookup(address), places_lookup(address))
+
+async def get_directions(origin, destination):
+    key = f"{coords_key(origin)}|{destination.lower()}"
+    directions = await directions_cache.get(key)
+    if directions is not None:
+        return directions
+    started = time.perf_counter()
+    directions = await fetch_directions(origin, destination)
+    if directions:
+        directions_cache.set(key, directions, (time.perf_counter() - started) * 1000)
+    return directions
 
-def get_directions(origin, destination):
-    url = "https://maps.googleapis.com/maps/api/directions/json"
+async def fetch_directions(origin, destination):
+    url = "/maps/api/directions/json"
     params = {
         "origin": origin,
         "destination": destination,
@@ -90,33 +823,748 @@ def get_directions(origin, destination):
         "region": "us",
         "key": GOOGLE_API_KEY
     }
-    r = requests.get(url, params=params)
-    directions_data = r.json()
+    leg = first_leg(await google_get(url, params, "directions"))
+    return leg_summary(leg) if leg else None
+
+def first_leg(directions_data):
     if directions_data.get("status") == "OK" and directions_data.get("routes"):
-        leg = directions_data["routes"][0]["legs"][0]
-        return {
-            "duration": leg["duration"]["text"],
-            "distance": leg["distance"]["text"]
-        }
+        return directions_data["routes"][0]["legs"][0]
     return None
 
+def leg_summary(leg):
+    return {
+        "duration": leg["duration"]["text"],
+        "distance": leg["distance"]["text"]
+    }
+
 def build_maps_link(origin_coords: str, destination_addr: str) -> str:
     origin_param = quote_plus(origin_coords)
     dest_param = quote_plus(destination_addr)
     return f"https://www.google.com/maps/dir/?api=1&origin={origin_param}&destination={dest_param}&travelmode=driving"
 
-# === Voice endpoints ===
-@app.post("/voice/outbound/intro")
-async def intro(request: Request):
-    form = await request.form()
-    call_sid = form.get("CallSid", "unknown")
-    from_number = form.get("From")
-    if from_number:
-        caller_numbers[call_sid] = from_number
-    call_activity[call_sid] = time.time()
-    call_mode[call_sid] = "normal"
-    call_memory[call_sid] = []
+# === Directions resolver ===
+# A cold origin used to cost up to three serial round trips: Geocoding,
+# then Places if that missed, then Directions. The resolver sends the spoken
+# origin straight to Directions, which geocodes it itself, so the usual case
+# is one request. The coordinate path (Geocoding raced against Places, then
+# Directions) starts when the direct lookup fails, or alongside it once it
+# has taken ROUTE_BACKUP_AFTER; the first path to produce a route wins and
+# the other is cancelled.
+ROUTE_DIRECT = os.getenv("ROUTE_DIRECT", "1") == "1"
+ROUTE_BACKUP_AFTER = float(os.getenv("ROUTE_BACKUP_AFTER", "0.5"))   # seconds
+# Directions happily routes "the airport" to some other city's airport;
+# a direct result further away than this is ignored in favour of the backup.
+DIRECT_ROUTE_MAX_METERS = int(os.getenv("DIRECT_ROUTE_MAX_METERS", "80000"))
+# When Directions can't place the origin it quietly falls back to a partial
+# match or the city centroid; those routes start from the wrong place.
+COARSE_PLACE_TYPES = {"political", "locality", "administrative_area_level_1", "administrative_area_level_2", "country"}
+
+def precise_origin(directions_data):
+    waypoints = directions_data.get("geocoded_waypoints") or [{}]
+    origin = waypoints[0]
+    types = set(origin.get("types", ()))
+    return not origin.get("partial_match") and not (types and types <= COARSE_PLACE_TYPES)
+
+async def fetch_direct_route(origin, destination):
+    """Returns (start coords, directions) straight from the spoken origin, or None."""
+    url = "/maps/api/directions/json"
+    params = {
+        "origin": f"{origin}, Myrtle Beach, SC",
+        "destination": destination,
+        "mode": "driving",
+        "region": "us",
+        "key": GOOGLE_API_KEY
+    }
+    data = await google_get(url, params, "directions")
+    leg = first_leg(data)
+    if not leg or not precise_origin(data) or leg["distance"]["value"] > DIRECT_ROUTE_MAX_METERS:
+        return None
+    start = leg["start_location"]
+    return f"{start['lat']},{start['lng']}", leg_summary(leg)
+
+async def fetch_coords_route(origin, destination):
+    """Returns (coords or None, directions or None) via Geocoding/Places then Directions."""
+    coords = await fetch_geocode(origin)
+    if not coords:
+        return None, None
+    return coords, await get_directions(coords, destination)
+
+async def resolve_route(origin, destination):
+    """Returns {"coords", "directions", "link"} for a spoken origin, or None
+    if the origin can't be found. directions is None when there's no route."""
+    key = normalize_origin(origin)
+    # Bare filler or just the city name normalizes to ""; never share that key
+    coords = await geocode_cache.get(key) if key else None
+    if coords is not None:
+        directions = await get_directions(coords, destination)
+    else:
+        started = time.perf_counter()
+        first_path = fetch_direct_route if ROUTE_DIRECT else fetch_coords_route
+        paths = {asyncio.create_task(first_path(origin, destination)): "direct" if ROUTE_DIRECT else "coords"}
+        winner = fallback = error = None
+        calls = 1
+        pending = set(paths)
+        try:
+            while pending and winner is None:
+                backup_started = "coords" in paths.values()
+                done, pending = await asyncio.wait(
+                    pending, timeout=None if backup_started else ROUTE_BACKUP_AFTER, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception():
+                        # The direct path is only a shortcut; its errors don't fail the turn
+                        if paths[task] == "coords":
+                            error = task.exception()
+                    elif task.result() and task.result()[1]:
+                        winner = task.result()
+                        calls = 1 if paths[task] == "direct" else 2
+                    elif task.result() and task.result()[0]:
+                        fallback = task.result()   # found the origin but no route
+                # Direct lookup failed, or is slow and there's room for a backup
+                if winner is None and not backup_started and (not pending or google_slots.has_headroom()):
+                    backup = asyncio.create_task(fetch_coords_route(origin, destination))
+                    paths[backup] = "coords"
+                    pending.add(backup)
+        finally:
+            for task in pending:
+                task.cancel()
+        if winner is None and fallback is None and error is not None:
+            raise error
+        coords, directions = winner or fallback or (None, None)
+        if not coords:
+            return None
+        cost_ms = (time.perf_counter() - started) * 1000
+        if key:
+            geocode_cache.set(key, coords, cost_ms, calls)
+        if directions:
+            directions_cache.set(f"{coords_key(coords)}|{destination.lower()}", directions, cost_ms)
+    return {"coords": coords, "directions": directions, "link": build_maps_link(coords, destination)}
+
+async def warm_geo_cache(landmarks=WARMUP_LANDMARKS):
+    for landmark in landmarks:
+        try:
+            await resolve_route(landmark, STORE_INFO["address"])
+        except Exception as e:
+            print(f"[ERROR] Cache warm-up failed for '{landmark}': {e}")
+
+# === Outbound SMS queue ===
+# The voice turn only enqueues the text and replies straight away; a small
+# pool of workers sends it through Twilio in the background and retries
+# transient failures with backoff. Like pending_replies, the queue is per
+# worker process.
+SMS_WORKERS = int(os.getenv("SMS_WORKERS", "8"))
+SMS_QUEUE_SIZE = int(os.getenv("SMS_QUEUE_SIZE", "1000"))
+SMS_MAX_ATTEMPTS = int(os.getenv("SMS_MAX_ATTEMPTS", "4"))
+SMS_RETRY_BASE = float(os.getenv("SMS_RETRY_BASE", "0.5"))   # seconds; doubles per retry
+SMS_STATUS_TTL = 3600   # seconds a finished message is kept for dedup and /stats
+
+SMS_STATUSES = ("queued", "sending", "retrying", "sent", "failed")
+
+def is_transient(error):
+    """Rate limits, Twilio 5xx and failures to connect are worth retrying; bad
+    numbers are not. Neither is an error after the request went out (a read
+    timeout, a dropped connection): Twilio may already have sent that text."""
+    if isinstance(error, TwilioRestException):
+        return error.status == 429 or error.status >= 500
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        # Refused, unreachable or DNS failure: nothing reached Twilio
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, urllib3.exceptions.ConnectTimeoutError)
+    return False
+
+def may_have_sent(error):
+    """Network errors that aren't transient happened after the POST was sent."""
+    return isinstance(error, OSError) and not is_transient(error)
+
+class OutboundSms:
+    __slots__ = ("call_sid", "to_number", "body", "link", "status", "attempts", "created", "finished", "error")
+
+    def __init__(self, call_sid, to_number, body, link):
+        self.call_sid = call_sid
+        self.to_number = to_number
+        self.body = body
+        self.link = link
+        self.status = "queued"
+        self.attempts = 0
+        self.created = time.time()
+        self.finished = None
+        self.error = None
+
+class SmsQueue:
+    def __init__(self, workers=SMS_WORKERS, maxsize=SMS_QUEUE_SIZE, max_attempts=SMS_MAX_ATTEMPTS, retry_base=SMS_RETRY_BASE):
+        self.worker_count = workers
+        self.maxsize = maxsize
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.queue = None
+        self.workers = []
+        self.messages = OrderedDict()   # (call_sid, link) -> OutboundSms, oldest first
+        self.stats = {"enqueued": 0, "deduplicated": 0, "rejected": 0, "retries": 0, "sent": 0, "failed": 0, "unconfirmed": 0}
+        self.send_latency = LatencySamples(Histogram(
+            "cpr_sms_delivery_seconds", "Enqueue to Twilio accepting the message, including retries."
+        ))
+
+    def start(self):
+        if self.workers:
+            return
+        self.queue = asyncio.Queue(self.maxsize)
+        # A fresh context so worker spans never land in the turn that started them
+        self.workers = [
+            asyncio.create_task(self.work(), context=contextvars.Context())
+            for _ in range(self.worker_count)
+        ]
+
+    async def stop(self, drain=2.0):
+        if not self.workers:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), drain)
+        except asyncio.TimeoutError:
+            pass
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
+
+    def enqueue(self, call_sid, to_number, body, link):
+        """Queues a text unless this call already has the same link queued or sent.
+
+        Returns the OutboundSms, or None if the queue is full.
+        """
+        self.start()
+        self.prune()
+        key = (call_sid, link)
+        existing = self.messages.get(key)
+        if existing is not None and existing.status != "failed":
+            self.stats["deduplicated"] += 1
+            return existing
+
+        message = OutboundSms(call_sid, to_number, body, link)
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return None
+        self.messages.pop(key, None)
+        self.messages[key] = message
+        self.stats["enqueued"] += 1
+        return message
+
+    def prune(self):
+        cutoff = time.time() - SMS_STATUS_TTL
+        while self.messages:
+            message = next(iter(self.messages.values()))
+            if message.finished is None or message.finished > cutoff:
+                break
+            self.messages.popitem(last=False)
+
+    async def work(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                await self.deliver(message)
+            except Exception as e:
+                print(f"[ERROR] SMS worker failed: {e}")
+                message.status = "failed"
+                message.finished = time.time()
+            finally:
+                self.queue.task_done()
+
+    async def deliver(self, message):
+        loop = asyncio.get_running_loop()
+        while True:
+            message.attempts += 1
+            message.status = "sending"
+            try:
+                with span("sms"):
+                    await loop.run_in_executor(
+                        twilio_executor,
+                        lambda: twilio_client.messages.create(to=message.to_number, from_=TWILIO_FROM_NUMBER, body=message.body)
+                    )
+            except Exception as e:
+                message.error = str(e)
+                if not is_transient(e) or message.attempts >= self.max_attempts:
+                    if may_have_sent(e):
+                        # Retrying could text the caller twice; count it as failed but say so
+                        print(f"[ERROR] SMS for {message.call_sid} unconfirmed, may have been delivered; not retrying: {e}")
+                        self.stats["unconfirmed"] += 1
+                    else:
+                        print(f"[ERROR] SMS send failed after {message.attempts} attempt(s): {e}")
+                    message.status = "failed"
+                    message.finished = time.time()
+                    self.stats["failed"] += 1
+                    return
+                message.status = "retrying"
+                self.stats["retries"] += 1
+                delay = self.retry_base * 2 ** (message.attempts - 1)
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+                continue
+            message.status = "sent"
+            message.error = None
+            message.finished = time.time()
+            self.stats["sent"] += 1
+            self.send_latency.record((message.finished - message.created) * 1000)
+            return
+
+    def status_counts(self):
+        counts = dict.fromkeys(SMS_STATUSES, 0)
+        for message in self.messages.values():
+            counts[message.status] += 1
+        return counts
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "by_status": self.status_counts(),
+            "delivery": self.send_latency.snapshot(),
+        }
+
+sms_queue = SmsQueue()
+
+# === Intent routing ===
+# Intents in priority order: when several match, the earliest entry wins.
+# Each is (name, mode it is bound to or None, trigger phrases); phrases match
+# on whole words, so "bye" never fires inside another word.
+INTENTS = [
+    ("goodbye", None, ["thank you bye", "goodbye", "bye", "that's all", "hang up"]),
+    ("directions", None, [
+        "direction", "directions",
+        # "to your" covers "to your store", "to your shop", "to your place" and so on
+        "how do i get there", "how do i get to you", "how do i get to your", "how do i get to the store",
+        "how to get there", "how to get to you", "how to get to your", "how to get to the store",
+        "where are you at", "where are y'all at", "where are ya'll at", "where are yall at",
+        "where ya'll at", "where yall at",
+    ]),
+    ("sms_yes", "offer_sms", [
+        "yes", "yeah", "yep", "sure", "please", "ok", "okay",
+        "send it", "text me", "send me the link", "that would help",
+    ]),
+    ("sms_no", "offer_sms", [
+        "no", "nope", "nah", "not now", "not really", "i guess not", "don't", "do not", "i'm good", "i am good",
+    ]),
+    ("hours", None, ["hour", "hours", "when are you open", "what time do you"]),
+    ("location", None, [
+        "where y'all at", "where are y'all at", "is the store located",
+        "address", "addresses", "location", "locations",
+    ]),
+    ("phone", None, ["phone", "number"]),
+    ("landmark", None, [
+        "landmark", "landmarks", "nearby", "close to", "around you", "around there",
+        "what's near you", "whats near you", "what's near there", "whats near there",
+    ]),
+]
+
+# What a turn means when nothing mode-specific matched
+MODE_FALLBACKS = {"offer_sms": "sms_unclear", "awaiting_origin": "origin"}
+
+# Domain guard before the LLM: plain substrings, so "iphone" counts as a phone
+DOMAIN_KEYWORDS = [
+    "repair", "screen", "battery", "cracked", "broken",
+    "device", "phone", "tablet", "hours", "address",
+    "location", "directions", "price", "quote", "appointment"
+]
+
+WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+def words_of(text):
+    return WORD.findall(text.lower().replace("’", "'"))
+
+class IntentRouter:
+    """Every intent phrase compiled into one word-level keyword trie.
+
+    classify() walks the transcript's words through the trie once, so the
+    per-turn cost depends on the length of what the caller said rather than
+    on how many intents or phrases are declared.
+    """
+
+    def __init__(self, intents, mode_fallbacks, domain_keywords):
+        self.priority = {name: i for i, (name, _, _) in enumerate(intents)}
+        self.modes = {name: mode for name, mode, _ in intents}
+        self.mode_fallbacks = mode_fallbacks
+        self.domain = re.compile("|".join(re.escape(k) for k in domain_keywords))
+        self.trie = {}
+        for name, _, phrases in intents:
+            for phrase in phrases:
+                node = self.trie
+                for word in words_of(phrase):
+                    node = node.setdefault(word, {})
+                node.setdefault(None, set()).add(name)   # None marks the end of a phrase
+
+    def matches(self, text):
+        words = words_of(text)
+        found = set()
+        for start in range(len(words)):
+            node = self.trie
+            for word in words[start:]:
+                child = node.get(word)
+                if child is None and word.endswith("'s"):
+                    child = node.get(word[:-2])   # "phone's" still says phone
+                if child is None:
+                    break
+                node = child
+                if None in node:
+                    found |= node[None]
+        return found
+
+    def classify(self, text, mode="normal"):
+        names = sorted(
+            (name for name in self.matches(text) if self.modes[name] in (None, mode)),
+            key=self.priority.get,
+        )
+        # Ending the call and asking for directions work from any mode
+        if names and names[0] in ("goodbye", "directions"):
+            return names[0]
+        if mode in self.mode_fallbacks:
+            bound = [name for name in names if self.modes[name] == mode]
+            return bound[0] if bound else self.mode_fallbacks[mode]
+        if names:
+            return names[0]
+        return "ai" if self.domain.search(text) else "off_topic"
+
+intent_router = IntentRouter(INTENTS, MODE_FALLBACKS, DOMAIN_KEYWORDS)
+
+# === LLM fallback ===
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(6 * 3600)))
+# Token-set overlap needed for a paraphrase to reuse an answer; 0 disables
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.8"))
+
+def build_system_prompt():
+    return f"""
+            You are a warm, knowledgeable receptionist for {STORE_INFO['name']} in {STORE_INFO['city']}.
+            You can chat naturally, answer open-ended repair or product questions,
+            but DO NOT guess store details like hours, address, phone, or landmarks. 
+            If asked anything unrelated, politely say you don't know and steer back to repairs or store info.
+            Do NOT answer general knowledge or unrelated trivia. If asked about services we offer, answer in 1 to 3 clear sentences.
+            Avoid long explanations, technical deep dives, or repair tutorials unless explicitly asked.
+            Always stay on CPR Cell Phone Repair topics.
+            """
+
+SYSTEM_PROMPT = build_system_prompt()
+
+FILLER_PHRASES = re.compile(
+    r"\b(?:i\s+was\s+wondering|i\s+wanted\s+to\s+know|i\s+want\s+to\s+know|can\s+you\s+tell\s+me"
+    r"|could\s+you\s+tell\s+me|do\s+you\s+know|let\s+me\s+ask|i\s+have\s+a\s+question)\b"
+)
+FILLER_WORDS = {
+    "um", "umm", "uh", "uhh", "er", "like", "so", "well", "hey", "hi", "hello", "please", "just",
+    "basically", "actually", "okay", "ok", "yeah", "the", "a", "an", "my", "your", "y'all", "guys",
+    "if", "or", "and", "thanks", "thank", "you", "for", "of", "on", "to", "is", "are", "it", "that", "this",
+    "how", "what", "what's", "do", "does", "can", "i", "i'm", "we", "get", "have", "need",
+}
+NUMBER_WORDS = {
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6", "seven": "7",
+    "eight": "8", "nine": "9", "ten": "10", "eleven": "11", "twelve": "12", "thirteen": "13",
+    "fourteen": "14", "fifteen": "15", "sixteen": "16", "seventeen": "17", "eighteen": "18",
+    "nineteen": "19", "twenty": "20", "thirty": "30", "forty": "40", "fifty": "50",
+}
+TENS = re.compile(r"[a-z]?[2-9]0")
+WORD_ALIASES = {
+    "batteries": "battery", "screens": "screen", "phones": "phone", "iphones": "iphone",
+    "cost": "price", "costs": "price", "much": "price", "prices": "price", "pricing": "price",
+    "fix": "repair", "fixing": "repair", "fixed": "repair", "repairs": "repair", "replace": "repair",
+    "replacement": "repair", "replacing": "repair", "cracked": "broken", "shattered": "broken",
+    "samsung": "galaxy", "ipads": "ipad",
+}
+
+def canonical_words(text):
+    out = []
+    for word in words_of(FILLER_PHRASES.sub(" ", text.lower())):
+        word = NUMBER_WORDS.get(word, word)
+        # "twenty three" -> "23", "s twenty three" -> "s23"
+        if out and len(word) == 1 and word.isdigit() and TENS.fullmatch(out[-1]):
+            out[-1] = out[-1][:-1] + word
+        # "i phone" -> "iphone", "s 23" -> "s23"
+        elif out and ((out[-1] == "i" and word in ("phone", "pad")) or (out[-1] in ("s", "a", "z") and word.isdigit())):
+            out[-1] += word
+        else:
+            out.append(word)
+    return [WORD_ALIASES.get(w, w) for w in out if w not in FILLER_WORDS]
+
+def normalize_question(text):
+    return " ".join(sorted(set(canonical_words(text))))
+
+# Words that name a different device when added to a model number
+MODEL_QUALIFIERS = {
+    "pro", "max", "plus", "mini", "ultra", "fe", "lite", "se", "air", "xl", "xr", "xs", "edge", "fold", "flip",
+}
+# Words that change what is being asked: "how much to fix" wants a price,
+# not the yes-we-fix-it answer to "can you fix"
+QUESTION_WORDS = {
+    "price", "quote", "long", "take", "time", "when", "worth", "sell", "buy", "trade", "warranty",
+    "guarantee", "stock", "appointment", "insurance", "data", "wait",
+}
+
+def question_signature(words):
+    """Words a similar question has to share exactly: model numbers and their
+    qualifiers ("iphone 13" vs "iphone 13 pro") and the kind of question."""
+    return {w for w in words if w in MODEL_QUALIFIERS or w in QUESTION_WORDS or any(c.isdigit() for c in w)}
+
+class AnswerCache:
+    """LLM answers for first-turn questions, keyed by normalize_question().
+
+    Misses on the exact key fall back to the closest cached question by
+    token-set (Jaccard) overlap, found through an inverted word index. Model
+    numbers, qualifiers and question words have to agree exactly, so an
+    iPhone 13 answer never serves a 14 or a 13 Pro, and "can you fix it"
+    never answers "how much to fix it".
+    """
+
+    def __init__(self, maxsize, ttl, similarity):
+        self.entries = TTLCache(maxsize, ttl)
+        self.similarity = similarity
+        self.index = {}   # word -> keys containing it
+        self.stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "saved_ms": 0.0}
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.stats["exact_hits"] += 1
+        elif self.similarity and (entry := self.closest(key)) is not None:
+            self.stats["similar_hits"] += 1
+        else:
+            self.stats["misses"] += 1
+            return None
+        self.stats["saved_ms"] += entry["ms"]
+        return entry["answer"]
+
+    def closest(self, key):
+        words = set(key.split())
+        signature = question_signature(words)
+        best, best_score = None, self.similarity
+        for candidate in {k for w in words for k in self.index.get(w, ())}:
+            # peek: scanning candidates must not refresh their place in the LRU
+            if self.entries.peek(candidate) is None:
+                self.unindex(candidate)
+                continue
+            other = set(candidate.split())
+            if signature != question_signature(other):
+                continue
+            score = len(words & other) / len(words | other)
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best and self.entries.get(best)
+
+    def set(self, key, answer, cost_ms):
+        if not key:
+            return
+        self.entries.set(key, {"answer": answer, "ms": round(cost_ms, 1)})
+        for word in key.split():
+            self.index.setdefault(word, set()).add(key)
+        if len(self.index) > 8 * self.entries.maxsize:
+            # Drop index entries for answers the LRU has already evicted
+            for word in list(self.index):
+                self.index[word] = {k for k in self.index[word] if k in self.entries.entries}
+                if not self.index[word]:
+                    del self.index[word]
+
+    def clear(self):
+        self.entries.entries.clear()
+        self.index.clear()
+
+    def unindex(self, key):
+        for word in key.split():
+            keys = self.index.get(word)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.index[word]
+
+    def snapshot(self):
+        lookups = self.stats["exact_hits"] + self.stats["similar_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "saved_ms": round(self.stats["saved_ms"], 1),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "size": len(self.entries),
+        }
+
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_SIMILARITY)
+
+# === Deferred LLM replies ===
+# Instead of holding the webhook open for the whole completion, the turn
+# starts a streamed completion in the background and answers right away
+# with a filler line and a <Redirect> to /voice/outbound/result, which
+# speaks each complete sentence as soon as it has streamed in.
+DEFERRED_LLM = os.getenv("DEFERRED_LLM", "1") == "1"
+DEFERRED_GRACE = float(os.getenv("DEFERRED_GRACE", "0.8"))       # wait in the turn itself before the filler
+DEFERRED_WAIT = float(os.getenv("DEFERRED_WAIT", "3"))           # wait per result request
+DEFERRED_MAX_REDIRECTS = int(os.getenv("DEFERRED_MAX_REDIRECTS", "4"))
+DEFERRED_STALE_AFTER = 120   # seconds before an uncollected reply is dropped
+
+SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
 
+# Turn start -> first words of the actual answer, deferred or not
+llm_time_to_first_audio = LatencySamples(Histogram(
+    "cpr_llm_time_to_first_audio_seconds", "Turn start to the first spoken words of an LLM answer."
+))
+
+class PendingReply:
+    __slots__ = (
+        "question", "question_key", "turn", "said", "text", "spoken", "done", "failed", "changed", "task", "started", "heard",
+    )
+
+    def __init__(self, question, question_key, turn, said=""):
+        self.question = question
+        self.question_key = question_key   # set when the answer may go in the answer cache
+        self.turn = turn                   # matches session.pending_turn while this is the live answer
+        self.said = said                   # spoken by another worker before this one took over
+        self.text = ""
+        self.spoken = 0                    # chars of text already handed to <Say>
+        self.done = False
+        self.failed = False
+        self.changed = asyncio.Event()
+        self.task = None
+        self.started = time.perf_counter()
+        self.heard = False
+
+    def take_sentences(self):
+        """Unspoken complete sentences (everything left once done)."""
+        if self.said and not self.spoken and self.text.startswith(self.said):
+            self.spoken = len(self.said)   # restarted answer repeated what was already heard
+        rest = self.text[self.spoken:]
+        if not self.done:
+            ends = list(SENTENCE_END.finditer(rest))
+            if not ends:
+                return ""
+            rest = rest[:ends[-1].end()]
+        self.spoken += len(rest)
+        return rest.strip()
+
+    async def next_sentences(self, timeout):
+        deadline = time.perf_counter() + timeout
+        while True:
+            self.changed.clear()
+            text = self.take_sentences()
+            remaining = deadline - time.perf_counter()
+            if text or self.done or remaining <= 0:
+                return text
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+pending_replies = {}   # call_sid -> PendingReply, only ever in this worker
+
+async def stream_reply(pending, messages):
+    try:
+        with span("llm"):
+            stream = await client.chat.completions.create(model="gpt-4o-mini", messages=messages, stream=True)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    pending.text += chunk.choices[0].delta.content
+                    if SENTENCE_END.search(chunk.choices[0].delta.content):
+                        pending.changed.set()
+        if not pending.text.strip():
+            pending.failed = True
+    except Exception as e:
+        print(f"[ERROR] AI fallback failed: {e}")
+        pending.failed = True
+    finally:
+        pending.done = True
+        pending.changed.set()
+
+def start_deferred_reply(session, question, question_key, turn=None):
+    """Starts streaming the answer to question. A new turn gets a fresh id;
+    passing the session's turn restarts that answer in this worker and picks
+    up after whatever the caller already heard."""
+    now = time.perf_counter()
+    for call_sid, stale in list(pending_replies.items()):
+        if call_sid == session.call_sid or now - stale.started > DEFERRED_STALE_AFTER:
+            stale.task.cancel()
+            del pending_replies[call_sid]
+
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    messages.extend(session.memory)
+    messages.append({"role": "user", "content": question})
+    said = session.pending_spoken if turn else ""
+    if said:
+        messages.append({"role": "assistant", "content": said})
+        messages.append({"role": "user", "content": "Please finish that answer without repeating what you already said."})
+    pending = PendingReply(question, question_key, turn or secrets.token_hex(8), said)
+    pending.task = asyncio.create_task(stream_reply(pending, messages))
+    pending_replies[session.call_sid] = pending
+    session.pending_question = question
+    session.pending_turn = pending.turn
+    session.pending_spoken = said
+    return pending
+
+def finish_deferred_reply(session):
+    pending_replies.pop(session.call_sid, None)
+    session.pending_question = None
+    session.pending_turn = None
+    session.pending_spoken = ""
+
+def result_action(turn, attempt):
+    return f"/voice/outbound/result?turn={turn}&attempt={attempt}"
+
+async def speak_pending_reply(session, pending, wait, attempt):
+    """Says whatever part of the reply is ready, then either redirects back
+    for the rest or, once it is all spoken, gathers the next question."""
+    text = await pending.next_sentences(wait)
+    finished = pending.done and pending.spoken >= len(pending.text)
+
+    if pending.failed or (not text and not finished and attempt >= DEFERRED_MAX_REDIRECTS):
+        pending.task.cancel()
+        finish_deferred_reply(session)
+        return twiml(RESPONSES["ai_error"])
+    if not text and not finished:
+        if attempt == 0:
+            return twiml(TEMPLATES["filler"].fill(result_action(pending.turn, 1)))
+        return twiml(TEMPLATES["still_checking"].fill(result_action(pending.turn, attempt + 1)))
+
+    if text and not pending.heard:
+        pending.heard = True
+        llm_time_to_first_audio.record((time.perf_counter() - pending.started) * 1000)
+    if not finished:
+        session.pending_spoken = f"{session.pending_spoken} {text}".strip()
+        return twiml(TEMPLATES["reply_continues"].fill(text, result_action(pending.turn, 1)))
+    finish_deferred_reply(session)
+    remember(session, "user", pending.question)
+    answer = pending.text if pending.text.startswith(pending.said) else f"{pending.said} {pending.text}"
+    remember(session, "assistant", answer.strip())
+    if pending.question_key:
+        answer_cache.set(pending.question_key, pending.text, (time.perf_counter() - pending.started) * 1000)
+    return twiml(TEMPLATES["reply"].fill(text) if text else RESPONSES["gather"])
+
+# === TwiML responses ===
+# Every response a turn can give is rendered through VoiceResponse once, at
+# startup or when STORE_INFO changes, and served as cached bytes. Responses
+# with spoken values (ETA, LLM replies) are rendered with placeholder
+# markers and split into a template, so a turn only has to XML-escape the
+# values and join the pieces.
+SLOT = "@@slot{}@@"
+
+def next_gather():
+    return Gather(input="speech", action="/voice/outbound/process", method="POST", timeout=20, speech_timeout="auto")
+
+def say_then_gather(*lines):
+    vr = VoiceResponse()
+    for line in lines:
+        vr.say(line)
+    vr.append(next_gather())
+    return vr
+
+class TwimlTemplate:
+    def __init__(self, build, slots):
+        rendered = str(build(*(SLOT.format(i) for i in range(slots))))
+        self.parts = []
+        for i in range(slots):
+            head, rendered = rendered.split(SLOT.format(i), 1)
+            self.parts.append(head.encode())
+        self.parts.append(rendered.encode())
+
+    def fill(self, *values):
+        out = [self.parts[0]]
+        for value, part in zip(values, self.parts[1:]):
+            out.append(xml_escape(str(value)).encode())
+            out.append(part)
+        return b"".join(out)
+
+def build_intro():
     vr = VoiceResponse()
     gather = Gather(
         input="speech",
@@ -128,165 +1576,296 @@ async def intro(request: Request):
     )
     gather.say(f"Thank you for calling {STORE_INFO['name']} in {STORE_INFO['city']}. How can I help you today?")
     vr.append(gather)
-    return Response(str(vr), media_type="application/xml")
+    return vr
+
+def build_goodbye():
+    vr = VoiceResponse()
+    vr.say(f"Thank you for calling {STORE_INFO['name']}. Goodbye.")
+    vr.hangup()
+    return vr
+
+def build_filler(line, action):
+    vr = VoiceResponse()
+    vr.say(line)
+    vr.pause(length=1)
+    vr.redirect(action, method="POST")
+    return vr
+
+def build_reply_continues(text, action):
+    vr = VoiceResponse()
+    vr.say(text)
+    vr.redirect(action, method="POST")
+    return vr
+
+def render_responses():
+    static = {
+        "intro": build_intro(),
+        "goodbye": build_goodbye(),
+        "gather": say_then_gather(),
+        "directions": say_then_gather("Sure, what is your starting address or location?"),
+        "sms_sent": say_then_gather("I'm texting it to you now. Tap the link in the text to open Google Maps and start navigation."),
+        "sms_failed": say_then_gather("I couldn't send the text just now."),
+        "sms_unavailable": say_then_gather("I couldn't send the text right now. Search Google Maps for our address."),
+        "sms_no": say_then_gather("Okay. If you change your mind, just say 'text me the directions'."),
+        "sms_unclear": say_then_gather("Sorry, I didn't catch that. Do you want me to text you the Google Maps link?"),
+        "origin_not_found": say_then_gather("I couldn't find that location. Try a street address or a well-known place nearby."),
+        "route_not_found": say_then_gather("I couldn't get directions from that location. Could you try a different starting point?"),
+        "lookup_failed": say_then_gather("Sorry, I'm having trouble looking that up right now. Could you say your starting location again?"),
+        "hours": say_then_gather(f"Our hours are {STORE_INFO['hours']}."),
+        "location": say_then_gather(f"We are located at {STORE_INFO['address']}."),
+        "phone": say_then_gather(f"Our phone number is {STORE_INFO['phone']}."),
+        "landmark": say_then_gather(
+            "We are near Goodwill and Lowe's Home Improvement, in the strip mall with Chipotle, McAlister's, "
+            "Sport Clips, and the UPS Store. We're also not far down the road from East Coast Honda."
+        ),
+        "off_topic": say_then_gather("I can help with CPR Cell Phone Repair questions like repairs, pricing, or booking. Is your question about a device or repair service?"),
+        "ai_error": say_then_gather("I'm having trouble responding right now. Please call again."),
+    }
+    RESPONSES.clear()
+    RESPONSES.update({name: str(vr).encode() for name, vr in static.items()})
+    TEMPLATES.update({
+        "eta": TwimlTemplate(lambda distance, duration: say_then_gather(
+            f"We are about {distance}, roughly a {duration} drive from there.",
+            "Would you like me to text you a Google Maps link to start navigation?"
+        ), 2),
+        "reply": TwimlTemplate(say_then_gather, 1),
+        "reply_continues": TwimlTemplate(build_reply_continues, 2),
+        "filler": TwimlTemplate(lambda action: build_filler("One moment while I check on that.", action), 1),
+        "still_checking": TwimlTemplate(lambda action: build_filler("Still checking on that.", action), 1),
+    })
+
+RESPONSES = {}   # name -> rendered TwiML bytes
+TEMPLATES = {}   # name -> TwimlTemplate
+
+def twiml(body):
+    return Response(body, media_type="application/xml")
+
+def update_store_info(**changes):
+    """Change store details at runtime and re-render everything that quotes them."""
+    global SYSTEM_PROMPT
+    STORE_INFO.update(changes)
+    SYSTEM_PROMPT = build_system_prompt()
+    answer_cache.clear()
+    render_responses()
+
+render_responses()
+
+# === Stats ===
+@app.get("/stats")
+async def stats():
+    return {
+        "geocode_cache": geocode_cache.snapshot(),
+        "directions_cache": directions_cache.snapshot(),
+        "answer_cache": answer_cache.snapshot(),
+        "llm_time_to_first_audio": llm_time_to_first_audio.snapshot(),
+        "pending_llm_replies": len(pending_replies),
+        "sms": sms_queue.snapshot(),
+    }
+
+ACTIVE_CALL_WINDOW = 60   # seconds since the last turn for a call to count as live
+
+def render_metrics(active_calls, call_sessions):
+    lines = []
+    for metric in (turn_latency, stage_latency, llm_time_to_first_audio.histogram, sms_queue.send_latency.histogram, upstream_errors, hedged_requests, slow_turns):
+        lines.extend(metric.render())
+
+    gauges = [
+        ("cpr_active_calls", "Calls with a turn in the last minute.", {(): active_calls}),
+        ("cpr_call_sessions", "CallSession records held by the session store.", {(): call_sessions}),
+        ("cpr_pending_llm_replies", "Deferred LLM replies still being streamed or collected.", {(): len(pending_replies)}),
+        ("cpr_google_requests_in_flight", "Google requests holding a connection slot.", {(): google_slots.in_flight}),
+        ("cpr_sms_queue_depth", "Texts waiting for an SMS worker.", {(): sms_queue.queue.qsize() if sms_queue.queue else 0}),
+        ("cpr_sms_messages", "Recent texts by delivery status.", {(status,): n for status, n in sms_queue.status_counts().items()}),
+        ("cpr_cache_entries", "Entries in each in-memory cache tier.", {
+            ("geocode",): len(geocode_cache.memory),
+            ("directions",): len(directions_cache.memory),
+            ("answer",): len(answer_cache.entries),
+        }),
+    ]
+    for name, help, values in gauges:
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+        labelnames = {"cpr_cache_entries": ("cache",), "cpr_sms_messages": ("status",)}.get(name, ())
+        lines += [f"{name}{format_labels(labelnames, labels)} {value}" for labels, value in values.items()]
+
+    lookups = Counter("cpr_cache_lookups_total", "Cache lookups by outcome.", ("cache", "result"))
+    saved = Counter("cpr_cache_saved_seconds_total", "Upstream time avoided by cache hits.", ("cache",))
+    for cache in (geocode_cache, directions_cache):
+        for result in ("memory_hits", "disk_hits", "misses"):
+            lookups.inc(cache.name, result, amount=cache.stats[result])
+        saved.inc(cache.name, amount=round(cache.stats["saved_ms"] / 1000, 3))
+    for result in ("exact_hits", "similar_hits", "misses"):
+        lookups.inc("answer", result, amount=answer_cache.stats[result])
+    saved.inc("answer", amount=round(answer_cache.stats["saved_ms"] / 1000, 3))
+    lines.extend(lookups.render())
+    lines.extend(saved.render())
+
+    outcomes = Counter("cpr_sms_total", "Texts by outcome; retries counts extra send attempts, unconfirmed the failures that may still have been delivered.", ("outcome",))
+    for outcome, total in sms_queue.stats.items():
+        outcomes.inc(outcome, amount=total)
+    lines.extend(outcomes.render())
+    return "\n".join(lines) + "\n"
+
+@app.get("/metrics")
+async def metrics():
+    active_calls, call_sessions = await sessions.counts(time.time() - ACTIVE_CALL_WINDOW)
+    return Response(render_metrics(active_calls, call_sessions), media_type="text/plain; version=0.0.4")
+
+# === Voice endpoints ===
+@app.post("/voice/outbound/intro")
+async def intro(request: Request):
+    with turn_trace("intro") as trace:
+        with span("form_parse"):
+            form = await request.form()
+        session = CallSession(form.get("CallSid", "unknown"), last_activity=time.time())
+        session.caller_number = form.get("From")
+        trace.call_sid = session.call_sid
+        await sessions.save(session)
+        return twiml(RESPONSES["intro"])
 
 @app.post("/voice/outbound/process")
 async def process(request: Request):
-    form = await request.form()
-    call_sid = form.get("CallSid", "unknown")
-    from_number = form.get("From")
-    if from_number:
-        caller_numbers[call_sid] = from_number
+    with turn_trace("process") as trace:
+        with span("form_parse"):
+            form = await request.form()
+        session = await sessions.load(form.get("CallSid", "unknown"))
+        trace.call_sid = session.call_sid
+        from_number = form.get("From")
+        if from_number:
+            session.caller_number = from_number
+        session.last_activity = time.time()
+        try:
+            return await handle_turn(session, (form.get("SpeechResult") or "").strip())
+        finally:
+            await sessions.save(session)
 
-    user_input = (form.get("SpeechResult") or "").strip()
+async def handle_turn(session, user_input):
     lower_input = user_input.lower()
-    vr = VoiceResponse()
-    call_activity[call_sid] = time.time()
+    with span("intent_match"):
+        intent = intent_router.classify(lower_input, session.mode)
+    current_trace.get().intent = intent
 
     # End call
-    if any(p in lower_input for p in ["thank you, bye", "thank you bye", "goodbye", "bye", "that's all", "hang up"]):
-        vr.say(f"Thank you for calling {STORE_INFO['name']}. Goodbye.")
-        vr.hangup()
-        return Response(str(vr), media_type="application/xml")
-
-    yes_phrases = ["yes", "yeah", "yep", "sure", "please", "ok", "okay", "send it", "text me", "send me the link", "that would help"]
-    no_phrases = ["no", "nope", "not now", "don't", "do not", "i'm good", "i am good"]
+    if intent == "goodbye":
+        session.mode = "ended"
+        stale = pending_replies.get(session.call_sid)
+        if stale:
+            stale.task.cancel()
+        finish_deferred_reply(session)
+        return twiml(RESPONSES["goodbye"])
 
     # === Directions intent (expanded triggers) ===
-    if (
-        re.search(r"\bdirections?\b", lower_input) or
-        re.search(r"\b(i\s+need|looking\s+for|get|send|give|can\s+you\s+send\s+me)\s+directions?\b", lower_input) or
-        re.search(r"how\s+do\s+i\s+get\s+(there|to\s+you|to\s+the\s+store|to\s+your\s+location)", lower_input) or
-        re.search(r"how\s+to\s+get\s+(there|to\s+you|to\s+the\s+store)", lower_input) or
-        re.search(r"where\s+(are\s+(you|y['’]all|ya['’]ll|yall)|ya['’]ll|yall)\s+at", lower_input)
-    ):
-        vr.say("Sure, what is your starting address or location?")
-        call_mode[call_sid] = "awaiting_origin"
-        gather = Gather(input="speech", action="/voice/outbound/process",
-                        method="POST", timeout=20, speech_timeout="auto")
-        vr.append(gather)
-        return Response(str(vr), media_type="application/xml")
+    if intent == "directions":
+        session.mode = "awaiting_origin"
+        return twiml(RESPONSES["directions"])
 
     # Handle SMS offer response
-    if call_mode.get(call_sid) == "offer_sms":
-        if any(p in lower_input for p in yes_phrases):
-            to_number = caller_numbers.get(call_sid)
-            link_info = pending_maps.get(call_sid)
+    if session.mode == "offer_sms":
+        if intent == "sms_yes":
+            to_number = session.caller_number
+            link_info = session.pending_map
             if to_number and link_info and twilio_client and TWILIO_FROM_NUMBER:
-                try:
-                    twilio_client.messages.create(
-                        to=to_number,
-                        from_=TWILIO_FROM_NUMBER,
-                        body=f"Directions to {STORE_INFO['name']}: {link_info['link']}"
-                    )
-                    vr.say("Sent. Tap the link in the text to open Google Maps and start navigation.")
-                except Exception as e:
-                    print(f"[ERROR] SMS send failed: {e}")
-                    vr.say("I couldn't send the text just now.")
+                body = f"Directions to {STORE_INFO['name']}: {link_info['link']}"
+                queued = sms_queue.enqueue(session.call_sid, to_number, body, link_info["link"])
+                reply = RESPONSES["sms_sent"] if queued else RESPONSES["sms_failed"]
             else:
-                vr.say("I couldn't send the text right now. Search Google Maps for our address.")
-            pending_maps.pop(call_sid, None)
-            call_mode[call_sid] = "normal"
-            g = Gather(input="speech", action="/voice/outbound/process", method="POST", timeout=20, speech_timeout="auto")
-            vr.append(g)
-            return Response(str(vr), media_type="application/xml")
-
-        if any(p in lower_input for p in no_phrases):
-            vr.say("Okay. If you change your mind, just say 'text me the directions'.")
-            pending_maps.pop(call_sid, None)
-            call_mode[call_sid] = "normal"
-            g = Gather(input="speech", action="/voice/outbound/process", method="POST", timeout=20, speech_timeout="auto")
-            vr.append(g)
-            return Response(str(vr), media_type="application/xml")
-
-        vr.say("Sorry, I didn't catch that. Do you want me to text you the Google Maps link?")
-        g = Gather(input="speech", action="/voice/outbound/process", method="POST", timeout=20, speech_timeout="auto")
-        vr.append(g)
-        return Response(str(vr), media_type="application/xml")
+                reply = RESPONSES["sms_unavailable"]
+            session.pending_map = None
+            session.mode = "normal"
+            return twiml(reply)
+
+        if intent == "sms_no":
+            session.pending_map = None
+            session.mode = "normal"
+            return twiml(RESPONSES["sms_no"])
+
+        return twiml(RESPONSES["sms_unclear"])
 
         # === Awaiting origin → compute ETA + offer SMS ===
-    if call_mode.get(call_sid) == "awaiting_origin":
-        origin_coords = geocode_address(user_input)
-        if not origin_coords:
-            vr.say("I couldn't find that location. Try a street address or a well-known place nearby.")
-            g = Gather(input="speech", action="/voice/outbound/process", method="POST", timeout=20, speech_timeout="auto")
-            vr.append(g)
-            return Response(str(vr), media_type="application/xml")
-
-        directions = get_directions(origin_coords, STORE_INFO["address"])
+    if session.mode == "awaiting_origin":
+        try:
+            route = await resolve_route(user_input, STORE_INFO["address"])
+        except (httpx.HTTPError, ValueError) as e:
+            # Google timed out or answered garbage; stay in awaiting_origin so the caller can repeat it
+            print(f"[ERROR] Directions lookup failed for '{user_input}': {e}")
+            return twiml(RESPONSES["lookup_failed"])
+        if not route:
+            return twiml(RESPONSES["origin_not_found"])
+        directions = route["directions"]
         if not directions:
-            vr.say("I couldn't get directions from that location. Could you try a different starting point?")
-            g = Gather(input="speech", action="/voice/outbound/process", method="POST", timeout=20, speech_timeout="auto")
-            vr.append(g)
-            return Response(str(vr), media_type="application/xml")
-
-        # Speak ETA
-        vr.say(f"We are about {directions['distance']}, roughly a {directions['duration']} drive from there.")
+            return twiml(RESPONSES["route_not_found"])
 
         # Store link + offer SMS
-        maps_link = build_maps_link(origin_coords, STORE_INFO["address"])
-        pending_maps[call_sid] = {"link": maps_link}
-        call_mode[call_sid] = "offer_sms"
-
-        vr.say("Would you like me to text you a Google Maps link to start navigation?")
-        g = Gather(input="speech", action="/voice/outbound/process", method="POST", timeout=20, speech_timeout="auto")
-        vr.append(g)
-        return Response(str(vr), media_type="application/xml")
+        session.pending_map = {"link": route["link"]}
+        session.mode = "offer_sms"
+        return twiml(TEMPLATES["eta"].fill(directions["distance"], directions["duration"]))
 
     # === Main store-info intents ===
-    if re.search(r"\bhours?\b|\bwhen\s+are\s+you\s+open\b|\bwhat\s+time\s+do\s+you\b", lower_input):
-        vr.say(f"Our hours are {STORE_INFO['hours']}.")
-    elif re.search(r"((where\s+(are\s+(you|y['’]all|ya['’]ll|yall)|y['’]all|ya['’]ll|yall)\s+at)|(is\s+the\s+store\s+located)|(address)|(location))", lower_input):
-        vr.say(f"We are located at {STORE_INFO['address']}.")
-    elif re.search(r"\b(what(\s+is)?\s+(your|the)\s+)?(phone(\s+number)?|number)\b", lower_input):
-        vr.say(f"Our phone number is {STORE_INFO['phone']}.")
-    elif re.search(r"(landmark|nearby|close\s+to|around\s+(you|there)|what'?s\s+(near|around)\s+(you|there))", lower_input):
-        vr.say(
-            "We are near Goodwill and Lowe's Home Improvement, in the strip mall with Chipotle, McAlister's, "
-            "Sport Clips, and the UPS Store. We're also not far down the road from East Coast Honda."
-        )
+    if intent in ("hours", "location", "phone", "landmark"):
+        return twiml(RESPONSES[intent])
+
     # === AI fallback for anything else ===
-    else:
-        # Domain guard BEFORE hitting OpenAI
-        repair_keywords = [
-            "repair", "screen", "battery", "cracked", "broken",
-            "device", "phone", "tablet", "hours", "address",
-            "location", "directions", "price", "quote", "appointment"
-        ]
-        if not any(term in lower_input for term in repair_keywords):
-            vr.say("I can help with CPR Cell Phone Repair questions like repairs, pricing, or booking. Is your question about a device or repair service?")
-            g = Gather(input="speech", action="/voice/outbound/process", method="POST", timeout=20, speech_timeout="auto")
-            vr.append(g)
-            return Response(str(vr), media_type="application/xml")
+    # Domain guard BEFORE hitting OpenAI
+    if intent == "off_topic":
+        return twiml(RESPONSES["off_topic"])
 
-        try:
-            system_prompt = f"""
-            You are a warm, knowledgeable receptionist for {STORE_INFO['name']} in {STORE_INFO['city']}.
-            You can chat naturally, answer open-ended repair or product questions,
-            but DO NOT guess store details like hours, address, phone, or landmarks. 
-            If asked anything unrelated, politely say you don't know and steer back to repairs or store info.
-            Do NOT answer general knowledge or unrelated trivia. If asked about services we offer, answer in 1 to 3 clear sentences.
-            Avoid long explanations, technical deep dives, or repair tutorials unless explicitly asked.
-            Always stay on CPR Cell Phone Repair topics.
-            """
-            messages = [{"role": "system", "content": system_prompt}]
-            if call_sid in call_memory:
-                messages.extend(call_memory[call_sid])
+    try:
+        # Only a first question has no context to depend on, so only
+        # those are served from (and written to) the answer cache
+        question_key = normalize_question(user_input) if not session.memory else None
+        reply_text = answer_cache.get(question_key) if question_key else None
+        if reply_text is None and DEFERRED_LLM:
+            pending = start_deferred_reply(session, user_input, question_key)
+            return await speak_pending_reply(session, pending, DEFERRED_GRACE, 0)
+        if reply_text is None:
+            messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+            messages.extend(session.memory)
             messages.append({"role": "user", "content": user_input})
 
-            ai_reply = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages
-            )
+            started = time.perf_counter()
+            with span("llm"):
+                ai_reply = await client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages
+                )
             reply_text = ai_reply.choices[0].message.content
-            remember(call_sid, "user", user_input)
-            remember(call_sid, "assistant", reply_text)
-            vr.say(reply_text)
-        except Exception as e:
-            print(f"[ERROR] AI fallback failed: {e}")
-            vr.say("I'm having trouble responding right now. Please call again.")
+            llm_time_to_first_audio.record((time.perf_counter() - started) * 1000)
+            if question_key:
+                answer_cache.set(question_key, reply_text, (time.perf_counter() - started) * 1000)
+        remember(session, "user", user_input)
+        remember(session, "assistant", reply_text)
+        return twiml(TEMPLATES["reply"].fill(reply_text))
+    except Exception as e:
+        print(f"[ERROR] AI fallback failed: {e}")
+        return twiml(RESPONSES["ai_error"])
 
-    # Always gather again unless the call is ending
-    g = Gather(input="speech", action="/voice/outbound/process", method="POST", timeout=20, speech_timeout="auto")
-    vr.append(g)
-    return Response(str(vr), media_type="application/xml")
\ No newline at end of file
+@app.post("/voice/outbound/result")
+async def result(request: Request):
+    with turn_trace("result") as trace:
+        with span("form_parse"):
+            form = await request.form()
+        session = await sessions.load(form.get("CallSid", "unknown"))
+        trace.call_sid = session.call_sid
+        trace.intent = "ai"
+        session.last_activity = time.time()
+        turn = request.query_params.get("turn")
+        try:
+            # attempt 0 is the caller's own turn; a result request counts from 1
+            attempt = max(1, int(request.query_params.get("attempt", "1")))
+        except ValueError:
+            attempt = 1
+        try:
+            if not turn or turn != session.pending_turn:
+                # A redirect left over from an answer that has finished or been replaced
+                return twiml(RESPONSES["gather"])
+            pending = pending_replies.get(session.call_sid)
+            if pending is not None and pending.turn != turn:
+                # An earlier question's answer, abandoned when the call moved to another worker
+                pending.task.cancel()
+                del pending_replies[session.call_sid]
+                pending = None
+            if pending is None:
+                # The turn ran in another worker (or before a restart); ask again here
+                pending = start_deferred_reply(session, session.pending_question, None, turn)
+            return await speak_pending_reply(session, pending, DEFERRED_WAIT, attempt)
+        finally:
+            await sessions.save(session)
@@ -0,0 +1,53 @@
+"""Helpers shared by the benchmark scripts."""
+import importlib, os, re, sys, time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(stub):
+    """Import app.py wired to the stub upstreams instead of the real APIs."""
+    os.environ["GOOGLE_MAPS_BASE_URL"] = stub.base_url
+    os.environ["OPENAI_BASE_URL"] = f"{stub.base_url}/v1"
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["GOOGLE_MAPS_KEY"] = "stub"
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from stubs import stub_twilio_client
+    module = importlib.import_module("app")
+    module.twilio_client = stub_twilio_client(stub.base_url)
+    module.TWILIO_FROM_NUMBER = "+18435550100"
+    return module
+
+
+def asgi_client(module):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=module.app), base_url="http://cpr.test")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+REDIRECT = re.compile(r"<Redirect[^>]*>([^<]+)</Redirect>")
+
+
+async def post_turn(http, path, form):
+    """POST one Twilio webhook and follow any <Redirect> chain, like Twilio would.
+
+    Returns (seconds until the first response, seconds until the last, final TwiML).
+    """
+    started = time.perf_counter()
+    r = await http.post(path, data=form)
+    r.raise_for_status()
+    first = time.perf_counter() - started
+    while (m := REDIRECT.search(r.text)) is not None:
+        r = await http.post(m.group(1).replace("&amp;", "&"), data=form)
+        r.raise_for_status()
+    return first, time.perf_counter() - started, r.text
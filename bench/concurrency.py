@@ -0,0 +1,73 @@
+"""Turn latency vs. number of simultaneous calls.
+
+Every call runs intro -> directions -> origin -> "yes" (SMS) -> AI question
+against local stub upstreams. With non-blocking I/O the per-turn latency
+should stay close to the upstream latency no matter how many calls overlap.
+Latency is measured to the first webhook response of each turn; deferred
+LLM redirects are followed but not counted.
+
+Every call has its own CallSid, origin and question, so the geocode,
+directions and answer caches and SMS dedup never hit; the numbers measure
+the upstream I/O, not the caches.
+
+    python bench/concurrency.py --levels 1,10,50,100
+"""
+import argparse, asyncio, contextlib, io, itertools, os, statistics, time
+
+from common import asgi_client, load_app, percentile, post_turn
+from stubs import StubConfig, StubServer
+
+SCRIPT = [
+    ("/voice/outbound/intro", ""),
+    ("/voice/outbound/process", "I need directions"),
+    ("/voice/outbound/process", "{n} North Kings Highway"),
+    ("/voice/outbound/process", "yes please"),
+    ("/voice/outbound/process", "how much is a galaxy a{n} screen repair"),
+]
+
+# Numbers calls across every level so no two calls share an input
+call_numbers = itertools.count(100)
+
+
+async def run_call(http, latencies):
+    n = next(call_numbers)
+    form = {"CallSid": f"CAbench{n:06d}", "From": "+18435550123"}
+    for path, speech in SCRIPT:
+        speech = speech.format(n=n)
+        first, _, _ = await post_turn(http, path, {**form, "SpeechResult": speech})
+        latencies.append(first)
+
+
+async def run_level(http, calls):
+    latencies = []
+    started = time.perf_counter()
+    # app.py prints slow-turn logs under load; keep the table readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(run_call(http, latencies) for _ in range(calls)))
+    return latencies, time.perf_counter() - started
+
+
+async def run_levels(module, levels):
+    print(f"{'calls':>6} {'turns':>6} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9} {'wall s':>8}")
+    async with module.app.router.lifespan_context(module.app), asgi_client(module) as http:
+        for calls in levels:
+            latencies, wall = await run_level(http, calls)
+            ms = [x * 1000 for x in latencies]
+            print(f"{calls:>6} {len(ms):>6} {statistics.mean(ms):>9.1f} {percentile(ms, 95):>9.1f} {max(ms):>9.1f} {wall:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,10,50,100", help="comma-separated simultaneous call counts")
+    args = parser.parse_args()
+    # A disk cache would carry hits over from earlier runs
+    os.environ["CACHE_DB_PATH"] = ""
+    os.environ.setdefault("WARMUP_LANDMARKS", "")
+
+    with StubServer(StubConfig(jitter=0.0)) as stub:
+        module = load_app(stub)
+        asyncio.run(run_levels(module, [int(x) for x in args.levels.split(",")]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Directions lookup wall-clock: the old serial pipeline vs app.resolve_route.
+
+The serial baseline is the pre-resolver code path: Geocoding, then Places
+if Geocoding missed, then Directions, one after another. Each strategy
+resolves the same cold origins (caches cleared before every lookup) against
+the stub Google endpoints, first with normal latency and then with a slow
+tail (a share of requests taking tail_factor times as long), where request
+hedging comes into play.
+
+Before timing anything it checks that normalize_origin gives the expected
+cache key for a set of spoken origins, including place names that start
+with a filler word ("Atwood", "Fromm Road") and must not collide.
+
+Exits with status 1 if a cache key is wrong, or if the resolver's median
+isn't faster than the serial baseline in every scenario.
+
+    python bench/directions.py
+"""
+import argparse, asyncio, contextlib, io, os, random, sys
+
+from common import load_app, percentile
+from stubs import StubConfig, StubServer
+
+ADDRESSES = ["{n} North Kings Highway", "{n} Ocean Boulevard", "{n} Highway 17 Bypass", "{n} 21st Avenue North"]
+LANDMARKS = ["Broadway at the Beach", "the airport", "Coastal Grand Mall", "the SkyWheel", "Barefoot Landing"]
+UNKNOWN = "nowhere near here"   # Directions only partial-matches it to the city; must fall through and miss
+# Spoken origin -> expected geocode cache key
+ORIGIN_KEYS = {
+    "I'm at the Hilton in Myrtle Beach": "hilton",
+    "um, I'm by the airport": "airport",
+    "1200 N Kings Hwy, Myrtle Beach SC": "1200 north kings highway",
+    "from 500 Ocean Blvd": "500 ocean boulevard",
+    "Main Street, North Myrtle Beach": "main street north myrtle beach",
+    "Atwood Street": "atwood street",
+    "Wood Street": "wood street",
+    "Nearwood Drive": "nearwood drive",
+    "Fromm Road": "fromm road",
+    "Theater Drive": "theater drive",
+    "sober living center": "sober living center",
+    "Myrtle Beach": "",
+}
+SCENARIOS = [
+    ("normal", {}),
+    ("slow tail", {"tail_rate": 0.05, "tail_factor": 10}),
+]
+
+
+def origins(count, seed):
+    rng = random.Random(seed)
+    picked = []
+    for i in range(count):
+        if i % 10 == 9:
+            picked.append(("unknown", UNKNOWN))
+        elif i % 2:
+            picked.append(("landmark", rng.choice(LANDMARKS)))
+        else:
+            picked.append(("address", rng.choice(ADDRESSES).format(n=rng.randint(100, 9999))))
+    return picked
+
+
+async def serial_lookup(app, origin, destination):
+    """The pre-resolver pipeline, kept as a baseline."""
+    geo = await app.google_request("/maps/api/geocode/json", {
+        "address": origin, "components": "locality:Myrtle Beach|administrative_area:SC|country:US", "key": app.GOOGLE_API_KEY,
+    }, "geocode")
+    coords = app.first_location(geo)
+    if not coords:
+        places = await app.google_request("/maps/api/place/textsearch/json", {
+            "query": f"{origin}, Myrtle Beach, SC", "key": app.GOOGLE_API_KEY,
+        }, "places")
+        coords = app.first_location(places)
+    if not coords:
+        return None
+    leg = app.first_leg(await app.google_request("/maps/api/directions/json", {
+        "origin": coords, "destination": destination, "mode": "driving", "region": "us", "key": app.GOOGLE_API_KEY,
+    }, "directions"))
+    return leg and app.leg_summary(leg)
+
+
+async def resolver_lookup(app, origin, destination):
+    route = await app.resolve_route(origin, destination)
+    return route and route["directions"]
+
+
+def check_origin_keys(app):
+    wrong = 0
+    for origin, expected in ORIGIN_KEYS.items():
+        got = app.normalize_origin(origin)
+        if got != expected:
+            wrong += 1
+            print(f"FAIL  {origin!r}: expected key {expected!r}, got {got!r}")
+    print(f"{len(ORIGIN_KEYS) - wrong}/{len(ORIGIN_KEYS)} origin cache keys as expected\n")
+    return wrong == 0
+
+
+def clear_caches(app):
+    for cache in (app.geocode_cache, app.directions_cache):
+        cache.memory.entries.clear()
+
+
+async def run(app, strategy, cases, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    timings = {"address": [], "landmark": [], "unknown": []}
+    found = 0
+
+    async def one(kind, origin):
+        nonlocal found
+        async with limit:
+            clear_caches(app)
+            started = asyncio.get_running_loop().time()
+            if await strategy(app, origin, app.STORE_INFO["address"]):
+                found += 1
+            timings[kind].append((asyncio.get_running_loop().time() - started) * 1000)
+
+    await asyncio.gather(*(one(kind, origin) for kind, origin in cases))
+    return timings, found
+
+
+async def scenario(app, stub, cases, concurrency):
+    app.GOOGLE_MAPS_BASE_URL = stub.base_url
+    app.google_latency.clear()
+    hedge = app.GOOGLE_HEDGE_PERCENTILE
+    strategies = [
+        ("serial", serial_lookup, 0),
+        ("resolver, no hedge", resolver_lookup, 0),
+        ("resolver", resolver_lookup, hedge),
+    ]
+    results = []
+    async with app.app.router.lifespan_context(app.app):
+        # Prime the latency samples hedging works from
+        await run(app, serial_lookup, cases[:60], concurrency)
+        for name, strategy, percentile_setting in strategies:
+            app.GOOGLE_HEDGE_PERCENTILE = percentile_setting
+            before = stub.calls()
+            timings, found = await run(app, strategy, cases, concurrency)
+            calls = stub.calls() - before
+            results.append((name, timings, found, sum(calls.values()) / len(cases)))
+    app.GOOGLE_HEDGE_PERCENTILE = hedge
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    os.environ.setdefault("CACHE_DB_PATH", "")
+    os.environ.setdefault("WARMUP_LANDMARKS", "")
+    cases = origins(args.lookups, args.seed)
+
+    slower = []
+    app = None
+    for label, options in SCENARIOS:
+        with StubServer(StubConfig(**options)) as stub:
+            if app is None:
+                app = load_app(stub)
+                if not check_origin_keys(app):
+                    sys.exit(1)
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = asyncio.run(scenario(app, stub, cases, args.concurrency))
+        print(f"{label}: {args.lookups} cold lookups, {args.concurrency} at a time")
+        print(f"  {'strategy':<20} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'address p50':>12} {'landmark p50':>13}"
+              f" {'unknown p50':>12} {'found':>6} {'requests':>9}")
+        medians = {}
+        for name, timings, found, requests in results:
+            every = [ms for kind in timings.values() for ms in kind]
+            medians[name] = percentile(every, 50)
+            print(f"  {name:<20} {percentile(every, 50):>8.1f} {percentile(every, 95):>8.1f} {percentile(every, 99):>8.1f}"
+                  f" {percentile(timings['address'], 50):>12.1f} {percentile(timings['landmark'], 50):>13.1f}"
+                  f" {percentile(timings['unknown'], 50):>12.1f} {found:>6} {requests:>9.2f}")
+        print()
+        if medians["resolver"] >= medians["serial"]:
+            slower.append(label)
+
+    if slower:
+        print(f"resolver not faster than serial in: {', '.join(slower)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Intent router regression corpus and per-turn cost.
+
+Checks every transcript in intent_corpus.jsonl against app.intent_router
+(exit status 1 on any mismatch), lists where the router now differs from
+the old if/elif chain, and times both. It then pads the router with dummy
+intents to show that classification cost stays roughly flat as intents
+are added.
+
+    python bench/intents.py
+"""
+import json, os, re, sys, timeit
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_corpus.jsonl")
+
+
+def legacy_classify(lower_input, mode="normal"):
+    """The pre-router if/elif chain from process(), kept as a baseline."""
+    if any(p in lower_input for p in ["thank you, bye", "thank you bye", "goodbye", "bye", "that's all", "hang up"]):
+        return "goodbye"
+    yes_phrases = ["yes", "yeah", "yep", "sure", "please", "ok", "okay", "send it", "text me", "send me the link", "that would help"]
+    no_phrases = ["no", "nope", "not now", "don't", "do not", "i'm good", "i am good"]
+    if (
+        re.search(r"\bdirections?\b", lower_input) or
+        re.search(r"\b(i\s+need|looking\s+for|get|send|give|can\s+you\s+send\s+me)\s+directions?\b", lower_input) or
+        re.search(r"how\s+do\s+i\s+get\s+(there|to\s+you|to\s+the\s+store|to\s+your\s+location)", lower_input) or
+        re.search(r"how\s+to\s+get\s+(there|to\s+you|to\s+the\s+store)", lower_input) or
+        re.search(r"where\s+(are\s+(you|y['’]all|ya['’]ll|yall)|ya['’]ll|yall)\s+at", lower_input)
+    ):
+        return "directions"
+    if mode == "offer_sms":
+        if any(p in lower_input for p in yes_phrases):
+            return "sms_yes"
+        if any(p in lower_input for p in no_phrases):
+            return "sms_no"
+        return "sms_unclear"
+    if mode == "awaiting_origin":
+        return "origin"
+    if re.search(r"\bhours?\b|\bwhen\s+are\s+you\s+open\b|\bwhat\s+time\s+do\s+you\b", lower_input):
+        return "hours"
+    if re.search(r"((where\s+(are\s+(you|y['’]all|ya['’]ll|yall)|y['’]all|ya['’]ll|yall)\s+at)|(is\s+the\s+store\s+located)|(address)|(location))", lower_input):
+        return "location"
+    if re.search(r"\b(what(\s+is)?\s+(your|the)\s+)?(phone(\s+number)?|number)\b", lower_input):
+        return "phone"
+    if re.search(r"(landmark|nearby|close\s+to|around\s+(you|there)|what'?s\s+(near|around)\s+(you|there))", lower_input):
+        return "landmark"
+    repair_keywords = [
+        "repair", "screen", "battery", "cracked", "broken",
+        "device", "phone", "tablet", "hours", "address",
+        "location", "directions", "price", "quote", "appointment"
+    ]
+    return "ai" if any(term in lower_input for term in repair_keywords) else "off_topic"
+
+
+def per_turn_us(fn, cases, number=200):
+    total = timeit.timeit(lambda: [fn(c["text"], c["mode"]) for c in cases], number=number)
+    return total / (number * len(cases)) * 1e6
+
+
+def main():
+    with open(CORPUS, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    failures = 0
+    for c in cases:
+        got = app.intent_router.classify(c["text"], c["mode"])
+        if got != c["intent"]:
+            failures += 1
+            print(f"FAIL  [{c['mode']}] {c['text']!r}: expected {c['intent']}, got {got}")
+        old = legacy_classify(c["text"], c["mode"])
+        if old != got:
+            print(f"DIFF  [{c['mode']}] {c['text']!r}: legacy chain said {old}, router says {got}")
+    print(f"{len(cases) - failures}/{len(cases)} corpus transcripts classified as expected\n")
+
+    print(f"{'classifier':<28} {'us/turn':>9}")
+    print(f"{'legacy if/elif chain':<28} {per_turn_us(legacy_classify, cases):>9.2f}")
+    print(f"{'intent router':<28} {per_turn_us(app.intent_router.classify, cases):>9.2f}")
+    for extra in (10, 100, 1000):
+        padded = app.IntentRouter(
+            app.INTENTS + [(f"dummy{i}", None, [f"dummy phrase {i}", f"another trigger {i}"]) for i in range(extra)],
+            app.MODE_FALLBACKS, app.DOMAIN_KEYWORDS,
+        )
+        print(f"{f'router + {extra} intents':<28} {per_turn_us(padded.classify, cases):>9.2f}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Simulated-call load test.
+
+Replays scripted Twilio conversations (intro -> directions -> origin ->
+accept SMS -> AI question -> goodbye) against the app, with Google, OpenAI
+and Twilio replaced by local stubs that have configurable latency and
+error rates. Reports throughput, turn latency percentiles and resident
+memory growth, and writes a JSON result that a later run can --compare
+against.
+
+    python bench/loadtest.py --calls 2000 --concurrency 100 --output base.json
+    python bench/loadtest.py --calls 2000 --concurrency 100 --compare base.json
+
+By default the app runs in-process over ASGI. --uvicorn starts it as a real
+server instead. That server has no Twilio credentials, so its SMS step
+takes the "couldn't send" path.
+"""
+import argparse, asyncio, contextlib, io, json, os, platform, random, socket, subprocess, sys, time
+
+import httpx
+
+from common import ROOT, asgi_client, load_app, percentile, post_turn
+from stubs import StubConfig, StubServer
+
+# Street addresses get a random house number so most miss the geo cache
+ORIGINS = [
+    "{n} North Kings Highway", "Broadway at the Beach", "the airport", "Coastal Grand Mall",
+    "{n} Ocean Boulevard", "I'm at the Hilton", "{n} Highway 17 Bypass", "nowhere in particular",
+]
+QUESTIONS = [
+    "how much is an iphone 13 screen repair", "do you fix samsung batteries", "can you repair a cracked ipad screen",
+    "how long does a battery replacement take", "do you fix water damaged phones", "what does a pixel 7 screen cost",
+]
+STEPS = ["intro", "directions", "origin", "sms", "question", "goodbye"]
+
+
+def conversation(rng):
+    return [
+        ("intro", "/voice/outbound/intro", ""),
+        ("directions", "/voice/outbound/process", "I need directions"),
+        ("origin", "/voice/outbound/process", rng.choice(ORIGINS).format(n=rng.randint(100, 9999))),
+        ("sms", "/voice/outbound/process", "yes please"),
+        ("question", "/voice/outbound/process", rng.choice(QUESTIONS)),
+        ("goodbye", "/voice/outbound/process", "that's all, goodbye"),
+    ]
+
+
+def parse_pairs(text):
+    return {k: float(v) for k, v in (item.split("=") for item in text.split(",") if item)} if text else {}
+
+
+def rss_mb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+async def run_call(http, n, rng, results):
+    form = {"CallSid": f"CAload{n:08d}", "From": f"+1843555{n % 10000:04d}"}
+    for step, path, speech in conversation(rng):
+        try:
+            first, total, _ = await post_turn(http, path, {**form, "SpeechResult": speech})
+            results[step].append((first, total))
+        except httpx.HTTPError:
+            results["errors"].append(step)
+
+
+async def run_load(http, args, rss):
+    rng = random.Random(args.seed)
+    results = {step: [] for step in STEPS}
+    results["errors"] = []
+    limit = asyncio.Semaphore(args.concurrency)
+    samples = []
+
+    async def one(n):
+        async with limit:
+            await run_call(http, n, rng, results)
+        if n % max(1, args.calls // 10) == 0:
+            samples.append(round(rss(), 1))
+
+    started = time.perf_counter()
+    # app.py prints slow-turn logs under load; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(one(n) for n in range(args.calls)))
+    return results, time.perf_counter() - started, samples
+
+
+def summarize(values):
+    ms = [v * 1000 for v in values]
+    return {
+        "count": len(ms),
+        "p50_ms": round(percentile(ms, 50), 1),
+        "p95_ms": round(percentile(ms, 95), 1),
+        "p99_ms": round(percentile(ms, 99), 1),
+        "max_ms": round(max(ms), 1) if ms else 0.0,
+    }
+
+
+def report(args, results, wall, rss_before, rss_after, rss_samples, stub_calls):
+    turns = [first for step in STEPS for first, _ in results[step]]
+    return {
+        "config": {
+            "calls": args.calls, "concurrency": args.concurrency, "mode": "uvicorn" if args.uvicorn else "asgi",
+            "latency": args.latency_overrides, "errors": args.error_overrides, "tail_rate": args.tail_rate, "seed": args.seed,
+            "python": platform.python_version(),
+        },
+        "summary": {
+            "wall_s": round(wall, 2),
+            "calls_per_s": round(args.calls / wall, 1),
+            "turns_per_s": round(len(turns) / wall, 1),
+            "turn_latency": summarize(turns),
+            "failed_turns": len(results["errors"]),
+            "rss_mb_start": round(rss_before, 1),
+            "rss_mb_end": round(rss_after, 1),
+            "rss_mb_growth": round(rss_after - rss_before, 1),
+            "rss_mb_samples": rss_samples,
+        },
+        # first = first webhook response; complete = after following deferred-LLM redirects
+        "steps": {
+            step: {"first": summarize([f for f, _ in results[step]]), "complete": summarize([t for _, t in results[step]])}
+            for step in STEPS
+        },
+        "upstream_calls": dict(stub_calls),
+    }
+
+
+def print_report(result):
+    s = result["summary"]
+    print(f"{result['config']['calls']} calls, concurrency {result['config']['concurrency']} ({result['config']['mode']})")
+    print(f"  throughput   {s['calls_per_s']} calls/s, {s['turns_per_s']} turns/s over {s['wall_s']}s")
+    t = s["turn_latency"]
+    print(f"  turn latency p50 {t['p50_ms']}ms  p95 {t['p95_ms']}ms  p99 {t['p99_ms']}ms  max {t['max_ms']}ms")
+    print(f"  failed turns {s['failed_turns']}")
+    print(f"  rss          {s['rss_mb_start']} -> {s['rss_mb_end']} MB ({s['rss_mb_growth']:+} MB)")
+    print(f"\n  {'step':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'complete p95':>13}")
+    for step, data in result["steps"].items():
+        f, c = data["first"], data["complete"]
+        print(f"  {step:<12} {f['p50_ms']:>8} {f['p95_ms']:>8} {f['p99_ms']:>8} {c['p95_ms']:>13}")
+    print(f"\n  upstream calls {result['upstream_calls']}")
+
+
+def compare(result, baseline_path, tolerance):
+    """Prints the change against a saved run; returns True on a regression."""
+    with open(baseline_path) as f:
+        base = json.load(f)
+    checks = [
+        ("turns/s", base["summary"]["turns_per_s"], result["summary"]["turns_per_s"], False),
+        ("p50 ms", base["summary"]["turn_latency"]["p50_ms"], result["summary"]["turn_latency"]["p50_ms"], True),
+        ("p95 ms", base["summary"]["turn_latency"]["p95_ms"], result["summary"]["turn_latency"]["p95_ms"], True),
+        ("p99 ms", base["summary"]["turn_latency"]["p99_ms"], result["summary"]["turn_latency"]["p99_ms"], True),
+        ("rss growth MB", base["summary"]["rss_mb_growth"], result["summary"]["rss_mb_growth"], True),
+    ]
+    regressed = False
+    print(f"\ncompared with {baseline_path} (tolerance {tolerance:.0%})")
+    differs = [k for k in result["config"] if base["config"].get(k) != result["config"][k]]
+    if differs:
+        print(f"  warning: runs differ in {', '.join(differs)}; the comparison may not be meaningful")
+    for name, old, new, lower_is_better in checks:
+        change = (new - old) / old if old else 0.0
+        worse = change > tolerance if lower_is_better else change < -tolerance
+        # Sub-millisecond latencies and small RSS deltas are noise; ignore tiny absolute changes
+        if lower_is_better and new - old < 5:
+            worse = False
+        regressed |= worse
+        print(f"  {name:<14} {old:>10} -> {new:<10} {change:+7.1%} {'REGRESSION' if worse else ''}")
+    return regressed
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+@contextlib.contextmanager
+def uvicorn_app(stub):
+    port = free_port()
+    env = {
+        **os.environ, "GOOGLE_MAPS_BASE_URL": stub.base_url, "OPENAI_BASE_URL": f"{stub.base_url}/v1",
+        "OPENAI_API_KEY": "stub", "GOOGLE_MAPS_KEY": "stub", "WARMUP_LANDMARKS": "", "CACHE_DB_PATH": "",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 15
+        while True:
+            try:
+                httpx.get(f"{base_url}/stats")
+                break
+            except httpx.TransportError:
+                if time.time() > deadline or proc.poll() is not None:
+                    raise RuntimeError("uvicorn did not start")
+                time.sleep(0.1)
+        yield base_url, proc.pid
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+async def drive(args, stub):
+    if args.uvicorn:
+        with uvicorn_app(stub) as (base_url, pid):
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+                before = rss_mb(pid)
+                results, wall, samples = await run_load(http, args, lambda: rss_mb(pid))
+                return results, wall, before, rss_mb(pid), samples
+
+    os.environ.setdefault("WARMUP_LANDMARKS", "")
+    os.environ.setdefault("CACHE_DB_PATH", "")
+    module = load_app(stub)
+    async with module.app.router.lifespan_context(module.app), asgi_client(module) as http:
+        before = rss_mb()
+        results, wall, samples = await run_load(http, args, rss_mb)
+        return results, wall, before, rss_mb(), samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50, help="calls in flight at once")
+    parser.add_argument("--latency", default="", help="stub latency overrides in seconds, e.g. openai=1.2,geocode=0.2")
+    parser.add_argument("--errors", default="", help="stub error rates, e.g. twilio=0.05,places=0.1")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="share of stub requests that take 10x as long")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--uvicorn", action="store_true", help="run the app under a real uvicorn server")
+    parser.add_argument("--output", help="write the JSON result here")
+    parser.add_argument("--compare", help="JSON result of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown before --compare fails")
+    args = parser.parse_args()
+    args.latency_overrides = parse_pairs(args.latency)
+    args.error_overrides = parse_pairs(args.errors)
+
+    stub_config = StubConfig(latency=args.latency_overrides, error_rate=args.error_overrides, tail_rate=args.tail_rate)
+    with StubServer(stub_config) as stub:
+        results, wall, rss_before, rss_after, samples = asyncio.run(drive(args, stub))
+        result = report(args, results, wall, rss_before, rss_after, samples, stub.calls())
+
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare and compare(result, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Local stand-ins for Google Maps, OpenAI and Twilio used by the benchmarks.
+
+Each upstream gets its own latency and error rate so a run can model a slow
+Directions API or a flaky Twilio without touching the real services.
+"""
+import asyncio, json, multiprocessing, random, socket, time
+from collections import Counter
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
+# Roughly where the store is; every stub route ends here
+STORE_LAT, STORE_LNG = 33.6523, -78.9810
+CITY_LAT, CITY_LNG = 33.6891, -78.8867   # Myrtle Beach centroid
+
+
+class StubConfig:
+    def __init__(self, latency=None, error_rate=None, jitter=0.1, tail_rate=0.0, tail_factor=10):
+        # seconds per upstream request; openai_token is the gap between streamed words
+        self.latency = {"geocode": 0.08, "places": 0.12, "directions": 0.1, "openai": 0.4, "openai_token": 0.03, "twilio": 0.3}
+        self.latency.update(latency or {})
+        self.error_rate = {k: 0.0 for k in self.latency}
+        self.error_rate.update(error_rate or {})
+        self.jitter = jitter
+        # tail_rate of requests take tail_factor times as long, like a real upstream's p99
+        self.tail_rate = tail_rate
+        self.tail_factor = tail_factor
+        self.calls = Counter()
+
+    async def delay(self, upstream):
+        self.calls[upstream] += 1
+        base = self.latency[upstream]
+        if random.random() < self.tail_rate:
+            base *= self.tail_factor
+        await asyncio.sleep(max(0.0, random.uniform(base * (1 - self.jitter), base * (1 + self.jitter))))
+        return random.random() < self.error_rate[upstream]
+
+
+def _coords_for(text):
+    # Stable fake coordinates within a few miles of the store
+    h = abs(hash(text.lower())) % 10000
+    return STORE_LAT + (h % 100 - 50) / 1000, STORE_LNG + (h // 100 - 50) / 1000
+
+
+def _error(status=500):
+    return Response(json.dumps({"status": "UNKNOWN_ERROR", "results": []}), status_code=status, media_type="application/json")
+
+
+def build_stub_app(config: StubConfig) -> FastAPI:
+    stub = FastAPI()
+
+    @stub.get("/_stub/calls")
+    async def calls():
+        return dict(config.calls)
+
+    @stub.get("/maps/api/geocode/json")
+    async def geocode(address: str = ""):
+        if await config.delay("geocode"):
+            return _error()
+        # Landmark names don't geocode; force the Places fallback for them
+        if "nowhere" in address.lower() or not any(ch.isdigit() for ch in address):
+            return {"status": "ZERO_RESULTS", "results": []}
+        lat, lng = _coords_for(address)
+        return {"status": "OK", "results": [{"geometry": {"location": {"lat": lat, "lng": lng}}}]}
+
+    @stub.get("/maps/api/place/textsearch/json")
+    async def places(query: str = ""):
+        if await config.delay("places"):
+            return _error()
+        if "nowhere" in query.lower():
+            return {"status": "ZERO_RESULTS", "results": []}
+        lat, lng = _coords_for(query.split(",")[0])
+        return {"status": "OK", "results": [{"geometry": {"location": {"lat": lat, "lng": lng}}}]}
+
+    @stub.get("/maps/api/directions/json")
+    async def directions(origin: str = "", destination: str = ""):
+        if await config.delay("directions"):
+            return _error()
+        place = origin.split(",")[0]
+        street = any(ch.isdigit() for ch in place)
+        waypoint = {"types": ["street_address"] if street else ["point_of_interest", "establishment"]}
+        try:
+            lat, lng = (float(x) for x in origin.split(","))
+        except ValueError:
+            lat, lng = _coords_for(place)
+        # Like Google, an origin it can't place routes from the city centroid as a partial match
+        if "nowhere" in place.lower():
+            lat, lng = CITY_LAT, CITY_LNG
+            waypoint = {"partial_match": True, "types": ["locality", "political"]}
+        meters = int(((lat - STORE_LAT) ** 2 + (lng - STORE_LNG) ** 2) ** 0.5 * 111000) + 500
+        return {"status": "OK", "geocoded_waypoints": [{"geocoder_status": "OK", **waypoint}], "routes": [{"legs": [{
+            "distance": {"text": f"{meters / 1609:.1f} mi", "value": meters},
+            "duration": {"text": f"{max(1, meters // 700)} mins", "value": max(60, meters // 12)},
+            "start_location": {"lat": lat, "lng": lng},
+            "end_location": {"lat": STORE_LAT, "lng": STORE_LNG},
+        }]}]}
+
+    @stub.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        # "openai" latency is time to first token; each later word adds openai_token
+        if await config.delay("openai"):
+            return Response(json.dumps({"error": {"message": "stub failure"}}), status_code=500, media_type="application/json")
+        question = body["messages"][-1]["content"]
+        text = (f"Yes, we can help with that. Bring it by and we'll take a look at your {question[:40]}. "
+                "Most repairs are done the same day.")
+        words = text.split(" ")
+        if not body.get("stream"):
+            await asyncio.sleep(config.latency["openai_token"] * len(words))
+            return {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+
+        async def events():
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(config.latency["openai_token"])
+                chunk = {
+                    "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            done = {
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": body["model"],
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @stub.post("/2010-04-01/Accounts/{account_sid}/Messages.json")
+    async def messages(account_sid: str):
+        if await config.delay("twilio"):
+            return Response(json.dumps({"code": 20500, "message": "stub failure", "status": 500}), status_code=500, media_type="application/json")
+        return Response(json.dumps({"sid": "SMstub", "account_sid": account_sid, "status": "queued"}), status_code=201, media_type="application/json")
+
+    return stub
+
+
+class StubTwilioHttpClient(TwilioHttpClient):
+    """Sends Twilio SDK requests to the stub server instead of api.twilio.com."""
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def request(self, method, url, *args, **kwargs):
+        url = url.replace("https://api.twilio.com", self.base_url)
+        return super().request(method, url, *args, **kwargs)
+
+
+def stub_twilio_client(base_url):
+    return Client("ACstub", "stubtoken", http_client=StubTwilioHttpClient(base_url))
+
+
+def _serve(config, port):
+    uvicorn.run(build_stub_app(config), host="127.0.0.1", port=port, log_level="warning", access_log=False, backlog=4096)
+
+
+class StubServer:
+    """Runs the stub app on a free localhost port in its own process.
+
+    A separate process keeps the stubs from competing with the app under
+    test for the GIL, which would otherwise show up as fake app latency.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or StubConfig()
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        self.port = sock.getsockname()[1]
+        sock.close()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.process = multiprocessing.get_context("spawn").Process(target=_serve, args=(self.config, self.port), daemon=True)
+
+    def calls(self):
+        return Counter(httpx.get(f"{self.base_url}/_stub/calls").json())
+
+    def __enter__(self):
+        self.process.start()
+        deadline = time.time() + 10
+        while True:
+            try:
+                httpx.get(f"{self.base_url}/_stub/calls")
+                return self
+            except httpx.TransportError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.join(timeout=5)
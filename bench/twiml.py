@@ -0,0 +1,58 @@
+"""Per-request TwiML cost: building VoiceResponse objects vs. cached bytes.
+
+First checks that every cached response and every filled template is
+byte-for-byte what the VoiceResponse path produces, including values that
+need XML escaping, then times both.
+
+    python bench/twiml.py
+"""
+import os, sys, timeit
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+REPLY = "Yes, we fix Samsung & Apple screens <usually> same-day, \"no\" appointment needed."
+
+# name -> (what a turn used to build per request, what it serves now)
+CASES = {
+    "intro": (app.build_intro, lambda: app.RESPONSES["intro"]),
+    "hours": (lambda: app.say_then_gather(f"Our hours are {app.STORE_INFO['hours']}."), lambda: app.RESPONSES["hours"]),
+    "goodbye": (app.build_goodbye, lambda: app.RESPONSES["goodbye"]),
+    "eta": (
+        lambda: app.say_then_gather(
+            "We are about 3.2 mi, roughly a 9 mins drive from there.",
+            "Would you like me to text you a Google Maps link to start navigation?",
+        ),
+        lambda: app.TEMPLATES["eta"].fill("3.2 mi", "9 mins"),
+    ),
+    "llm reply": (lambda: app.say_then_gather(REPLY), lambda: app.TEMPLATES["reply"].fill(REPLY)),
+    "llm partial": (
+        lambda: app.build_reply_continues(REPLY, app.result_action("3f2a", 1)),
+        lambda: app.TEMPLATES["reply_continues"].fill(REPLY, app.result_action("3f2a", 1)),
+    ),
+    "filler": (
+        lambda: app.build_filler("One moment while I check on that.", app.result_action("3f2a", 1)),
+        lambda: app.TEMPLATES["filler"].fill(app.result_action("3f2a", 1)),
+    ),
+}
+
+
+def main():
+    mismatches = 0
+    for name, (build, cached) in CASES.items():
+        if str(build()).encode() != cached():
+            mismatches += 1
+            print(f"MISMATCH {name}:\n  built:  {str(build())}\n  cached: {cached().decode()}")
+
+    number = 2000
+    print(f"{'response':<14} {'VoiceResponse us':>17} {'cached us':>10} {'speedup':>8}")
+    for name, (build, cached) in CASES.items():
+        built = timeit.timeit(lambda: str(build()).encode(), number=number) / number * 1e6
+        served = timeit.timeit(cached, number=number) / number * 1e6
+        print(f"{name:<14} {built:>17.2f} {served:>10.2f} {built / served:>7.0f}x")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()